@@ -1,11 +1,24 @@
 from flask import Flask, jsonify, request
-import requests
+import os
+import sys
 import time
-import hashlib
-import hmac
 import json
+import logging
 import uuid
 
+# Общие модули из fingerbot_api (пул keep-alive соединений и т.д.)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fingerbot_api"))
+import http_pool
+from dispatcher import DeviceDispatcher, QueueFull, PRIORITY_COMMAND, PRIORITY_READ
+from singleflight import SingleFlight
+from log_setup import setup_logging
+from commands import COMMANDS, prepare_properties
+from signature import Signer, serialize_body
+
+# Logging: LOG_LEVEL=DEBUG adds signatures, payloads and responses of every Tuya call
+setup_logging(os.getenv("LOG_LEVEL", "INFO").upper(), os.getenv("LOG_FORMAT", "text"))
+logger = logging.getLogger("fingerbot")
+
 app = Flask(__name__)
 
 # Tuya credentials
@@ -25,14 +38,7 @@ def generate_nonce():
 
 def calculate_content_sha256(body):
     """Calculate SHA256 of request body"""
-    if body is None or body == "":
-        # Empty body SHA256
-        return "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855"
-    
-    if isinstance(body, dict):
-        body = json.dumps(body)
-    
-    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+    return serialize_body(body)[1]
 
 def build_url(path, params=None):
     """Build URL with sorted parameters"""
@@ -44,43 +50,12 @@ def build_url(path, params=None):
     query_string = "&".join([f"{k}={v}" for k, v in sorted_params])
     return f"{path}?{query_string}"
 
+# HMAC key is prepared once; every signature starts from a copy of it
+signer = Signer(CLIENT_ID, CLIENT_SECRET)
+
 def generate_signature(method, url, body, access_token=None, custom_headers=None):
     """Generate signature according to Tuya documentation"""
-    
-    # Timestamp
-    t = str(int(time.time() * 1000))
-    
-    # Nonce
-    nonce = generate_nonce()
-    
-    # Content SHA256
-    content_sha256 = calculate_content_sha256(body)
-    
-    # Build stringToSign
-    string_to_sign_parts = [
-        method.upper(),
-        content_sha256,
-        "",  # Empty headers for now (no custom signature headers)
-        url
-    ]
-    string_to_sign = "\n".join(string_to_sign_parts)
-    
-    # Build the string for HMAC
-    if access_token:
-        # General business API
-        str_for_hmac = CLIENT_ID + access_token + t + nonce + string_to_sign
-    else:
-        # Token management API
-        str_for_hmac = CLIENT_ID + t + nonce + string_to_sign
-    
-    # Generate signature
-    signature = hmac.new(
-        CLIENT_SECRET.encode('utf-8'),
-        str_for_hmac.encode('utf-8'),
-        hashlib.sha256
-    ).hexdigest().upper()
-    
-    return signature, t, nonce
+    return signer.sign(method, url, calculate_content_sha256(body), access_token)
 
 def get_access_token():
     """Get access token with correct signature"""
@@ -106,43 +81,34 @@ def get_access_token():
             "sign_method": "HMAC-SHA256"
         }
         
-        print(f"🔐 Получение токена...")
-        print(f"   URL: {BASE_URL}{url}")
-        print(f"   Timestamp: {t}")
-        print(f"   Nonce: {nonce}")
-        print(f"   Signature: {signature[:20]}...")
+        logger.info("🔐 Получение токена: %s%s", BASE_URL, url)
+        logger.debug("   t=%s nonce=%s sign=%s", t, nonce, signature)
         
         # GET request for token
-        response = requests.get(
+        response = http_pool.get_session(BASE_URL).get(
             f"{BASE_URL}{url}",
             headers=headers,
             timeout=10
         )
         
-        print(f"   Response Status: {response.status_code}")
-        
         if response.status_code == 200:
             data = response.json()
-            print(f"   Response Data: {json.dumps(data, indent=2)}")
             
             if data.get("success"):
                 access_token = data["result"]["access_token"]
                 token_expiry = time.time() + data["result"]["expire_time"]
-                print(f"✅ Токен получен успешно!")
-                print(f"   Access Token: {access_token[:20]}...")
-                print(f"   Expires in: {data['result']['expire_time']} секунд")
+                logger.info("✅ Токен получен, действует %s с", data["result"]["expire_time"])
                 return access_token
             else:
                 error_msg = data.get("msg", "Unknown error")
-                print(f"❌ Ошибка получения токена: {error_msg}")
+                logger.error("❌ Ошибка получения токена: %s", error_msg)
                 return None
         else:
-            print(f"❌ HTTP ошибка: {response.status_code}")
-            print(f"   Response: {response.text}")
+            logger.error("❌ HTTP ошибка %s: %s", response.status_code, response.text[:200])
             return None
             
     except Exception as e:
-        print(f"❌ Исключение при получении токена: {e}")
+        logger.exception("❌ Исключение при получении токена: %s", e)
         return None
 
 def call_tuya_api_v2(endpoint, method="GET", payload=None, params=None):
@@ -155,8 +121,11 @@ def call_tuya_api_v2(endpoint, method="GET", payload=None, params=None):
         # Build URL with parameters
         url = build_url(endpoint, params)
         
+        # Serialize the body once and sign exactly the bytes that are sent
+        body, body_sha256 = serialize_body(payload if method in ("POST", "PUT") else None)
+        
         # Generate signature for API call
-        signature, t, nonce = generate_signature(method, url, payload, token)
+        signature, t, nonce = signer.sign(method, url, body_sha256, token)
         
         headers = {
             "client_id": CLIENT_ID,
@@ -168,30 +137,30 @@ def call_tuya_api_v2(endpoint, method="GET", payload=None, params=None):
             "Content-Type": "application/json"
         }
         
-        print(f"🌐 API v2.0 Call: {method} {BASE_URL}{url}")
-        print(f"   Timestamp: {t}")
-        print(f"   Nonce: {nonce}")
-        print(f"   Signature: {signature[:20]}...")
-        
-        if payload:
-            print(f"   Payload: {json.dumps(payload, indent=2)}")
+        # Signature and payload are only formatted when DEBUG is enabled
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "🌐 API v2.0 Call: %s %s%s t=%s nonce=%s sign=%s payload=%s",
+                method, BASE_URL, url, t, nonce, signature,
+                body.decode() if body else "-"
+            )
         
         full_url = f"{BASE_URL}{url}"
         
+        session = http_pool.get_session(BASE_URL)
         if method == "GET":
-            response = requests.get(full_url, headers=headers, timeout=10)
+            response = session.get(full_url, headers=headers, timeout=10)
         elif method == "POST":
-            response = requests.post(full_url, headers=headers, json=payload, timeout=10)
+            response = session.post(full_url, headers=headers, data=body, timeout=10)
         elif method == "PUT":
-            response = requests.put(full_url, headers=headers, json=payload, timeout=10)
+            response = session.put(full_url, headers=headers, data=body, timeout=10)
         elif method == "DELETE":
-            response = requests.delete(full_url, headers=headers, timeout=10)
-        
-        print(f"   Response Status: {response.status_code}")
+            response = session.delete(full_url, headers=headers, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
-            print(f"   Response Data: {json.dumps(data, indent=2)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("   Response %s %s: %s", method, url, json.dumps(data))
             return data
         else:
             error_response = {
@@ -199,14 +168,47 @@ def call_tuya_api_v2(endpoint, method="GET", payload=None, params=None):
                 "error": f"HTTP {response.status_code}",
                 "response": response.text[:200]
             }
-            print(f"   API Error: {error_response}")
+            logger.warning("⚠️ API Error %s %s: %s", method, url, error_response)
             return error_response
             
     except Exception as e:
         error_response = {"success": False, "error": str(e)}
-        print(f"   API Exception: {error_response}")
+        logger.warning("⚠️ API Exception %s %s: %s", method, endpoint, e)
         return error_response
 
+# Per-device queue: actuation commands run before status reads
+dispatcher = DeviceDispatcher()
+
+# Identical concurrent reads share one queue slot and one Tuya call,
+# so a burst of status polls cannot fill the queue (QueueFull -> 503)
+inflight_reads = SingleFlight()
+
+def call_device_api(endpoint, method="GET", payload=None, params=None):
+    """Call device API through the dispatch queue (GET is a read, anything else a command)"""
+    if method == "GET":
+        return inflight_reads.do(
+            (endpoint, tuple(sorted((params or {}).items()))),
+            lambda: dispatcher.run(DEVICE_ID, PRIORITY_READ, lambda: call_tuya_api_v2(endpoint, method, payload, params))
+        )
+    return dispatcher.run(
+        DEVICE_ID,
+        PRIORITY_COMMAND,
+        lambda: call_tuya_api_v2(endpoint, method, payload, params)
+    )
+
+@app.errorhandler(QueueFull)
+def queue_full(e):
+    """Device queue is full - ask the client to retry later"""
+    response = jsonify({
+        "success": False,
+        "error": "Device queue is full",
+        "device_id": e.device_id,
+        "pending": e.depth
+    })
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
 @app.route("/")
 def home():
     return jsonify({
@@ -257,193 +259,54 @@ def test_connection():
 @app.route("/device_info")
 def device_info():
     """Get device information"""
-    result = call_tuya_api_v2(f"/v1.0/devices/{DEVICE_ID}")
+    result = call_device_api(f"/v1.0/devices/{DEVICE_ID}")
     return jsonify(result)
 
 @app.route("/device_status")
 def device_status():
     """Get current device status"""
-    result = call_tuya_api_v2(f"/v1.0/devices/{DEVICE_ID}/status")
+    result = call_device_api(f"/v1.0/devices/{DEVICE_ID}/status")
     return jsonify(result)
 
 @app.route("/device_functions")
 def device_functions():
     """Get device functions and specifications"""
-    result = call_tuya_api_v2(f"/v1.0/devices/{DEVICE_ID}/functions")
+    result = call_device_api(f"/v1.0/devices/{DEVICE_ID}/functions")
     return jsonify(result)
 
 @app.route("/get_desired_properties")
 def get_desired_properties():
     """Query desired properties of the device"""
-    result = call_tuya_api_v2(f"/v2.0/cloud/thing/{DEVICE_ID}/shadow/properties/desired")
+    result = call_device_api(f"/v2.0/cloud/thing/{DEVICE_ID}/shadow/properties/desired")
     return jsonify(result)
 
-@app.route("/set_press")
-def set_press():
-    """Set press command - lower the arm completely"""
-    payload = {
-        "properties": json.dumps({
-            "arm_down_percent": 100,  # Полностью опустить
-            "arm_up_percent": 0,      # Поднять на 0%
-            "switch": True            # Включить устройство
-        }),
-        "duration": 3600,
-        "type": 1
-    }
-    
-    result = call_tuya_api_v2(
-        f"/v2.0/cloud/thing/{DEVICE_ID}/shadow/properties/desired", 
-        "POST", 
-        payload
-    )
-    
-    return jsonify({
-        "action": "press",
-        "command": "Lower arm completely (press)",
-        "parameters": {
-            "arm_down_percent": 100,
-            "arm_up_percent": 0, 
-            "switch": True
-        },
-        "result": result
-    })
-
-@app.route("/set_release")  
-def set_release():
-    """Set release command - raise the arm completely"""
-    payload = {
-        "properties": json.dumps({
-            "arm_down_percent": 0,    # Опустить на 0%
-            "arm_up_percent": 100,    # Полностью поднять
-            "switch": True            # Включить устройство
-        }),
-        "duration": 3600,
-        "type": 1
-    }
-    
-    result = call_tuya_api_v2(
-        f"/v2.0/cloud/thing/{DEVICE_ID}/shadow/properties/desired", 
-        "POST", 
-        payload
-    )
-    
-    return jsonify({
-        "action": "release", 
-        "command": "Raise arm completely (release)",
-        "parameters": {
-            "arm_down_percent": 0,
-            "arm_up_percent": 100,
-            "switch": True
-        },
-        "result": result
-    })
-
-@app.route("/set_click")
-def set_click():
-    """Set click command - press and release (full cycle)"""
-    payload = {
-        "properties": json.dumps({
-            "arm_down_percent": 100,  # Опустить
-            "arm_up_percent": 100,    # Затем поднять
-            "switch": True,           # Включить устройство
-            "mode": "click"           # Режим клика
-        }),
-        "duration": 3600,
-        "type": 1
-    }
-    
-    result = call_tuya_api_v2(
-        f"/v2.0/cloud/thing/{DEVICE_ID}/shadow/properties/desired", 
-        "POST", 
-        payload
-    )
-    
-    return jsonify({
-        "action": "click",
-        "command": "Press and release (click cycle)",
-        "parameters": {
-            "arm_down_percent": 100,
-            "arm_up_percent": 100,
-            "switch": True,
-            "mode": "click"
-        },
-        "result": result
-    })
-
-@app.route("/set_custom_position")
-def set_custom_position():
-    """Set custom arm position with parameters"""
-    # Get parameters from query string
-    down_percent = request.args.get('down', type=int, default=50)
-    up_percent = request.args.get('up', type=int, default=50)
-    hold_time = request.args.get('hold', type=int, default=2)
-    
-    # Validate parameters
-    down_percent = max(0, min(100, down_percent))
-    up_percent = max(0, min(100, up_percent))
-    hold_time = max(0, min(10, hold_time))
-    
-    payload = {
-        "properties": json.dumps({
-            "arm_down_percent": down_percent,
-            "arm_up_percent": up_percent,
-            "click_sustain_time": hold_time,
-            "switch": True,
-            "mode": "click"
-        }),
-        "duration": 3600,
-        "type": 1
-    }
-    
-    result = call_tuya_api_v2(
-        f"/v2.0/cloud/thing/{DEVICE_ID}/shadow/properties/desired", 
-        "POST", 
-        payload
-    )
+def command_view(command):
+    """Route for a command from the COMMANDS table (parameters come from the query string)"""
+    def view():
+        args = {param.arg: request.args.get(param.arg, type=int) for param in command.params}
+        properties, body = command.build(args)
+        
+        result = call_device_api(
+            f"/v2.0/cloud/thing/{DEVICE_ID}/shadow/properties/desired", 
+            "POST", 
+            body
+        )
+        
+        response = {
+            "action": command.action,
+            "command": command.describe(properties)
+        }
+        if properties:
+            response["parameters"] = properties
+        response["result"] = result
+        return jsonify(response)
     
-    return jsonify({
-        "action": "custom_position",
-        "command": f"Set custom position: down={down_percent}%, up={up_percent}%, hold={hold_time}s",
-        "parameters": {
-            "arm_down_percent": down_percent,
-            "arm_up_percent": up_percent,
-            "click_sustain_time": hold_time,
-            "switch": True,
-            "mode": "click"
-        },
-        "result": result
-    })
+    view.__doc__ = command.description
+    return view
 
-@app.route("/set_hold_time")
-def set_hold_time():
-    """Set click hold time (0-10 seconds)"""
-    hold_time = request.args.get('time', type=int, default=2)
-    hold_time = max(0, min(10, hold_time))
-    
-    payload = {
-        "properties": json.dumps({
-            "click_sustain_time": hold_time,
-            "switch": True
-        }),
-        "duration": 3600,
-        "type": 1
-    }
-    
-    result = call_tuya_api_v2(
-        f"/v2.0/cloud/thing/{DEVICE_ID}/shadow/properties/desired", 
-        "POST", 
-        payload
-    )
-    
-    return jsonify({
-        "action": "set_hold_time",
-        "command": f"Set click hold time to {hold_time} seconds",
-        "parameters": {
-            "click_sustain_time": hold_time,
-            "switch": True
-        },
-        "result": result
-    })
+# Press, click and position routes are generated from the command table
+for command in COMMANDS.values():
+    app.add_url_rule(command.route, command.action, command_view(command))
 
 @app.route("/toggle_switch")
 def toggle_switch():
@@ -451,7 +314,7 @@ def toggle_switch():
     switch_state = request.args.get('state', type=str, default='toggle')
     
     # Get current status to determine toggle
-    current_status = call_tuya_api_v2(f"/v1.0/devices/{DEVICE_ID}/status")
+    current_status = call_device_api(f"/v1.0/devices/{DEVICE_ID}/status")
     
     current_switch = True  # Default to on
     if current_status.get("success") and "result" in current_status:
@@ -468,15 +331,9 @@ def toggle_switch():
     else:  # toggle
         new_switch = not current_switch
     
-    payload = {
-        "properties": json.dumps({
-            "switch": new_switch
-        }),
-        "duration": 3600,
-        "type": 1
-    }
+    payload = prepare_properties({"switch": new_switch})
     
-    result = call_tuya_api_v2(
+    result = call_device_api(
         f"/v2.0/cloud/thing/{DEVICE_ID}/shadow/properties/desired", 
         "POST", 
         payload
@@ -493,27 +350,6 @@ def toggle_switch():
         "result": result
     })
 
-@app.route("/clear_commands")
-def clear_commands():
-    """Clear all desired properties"""
-    payload = {
-        "properties": json.dumps({}),
-        "duration": 1,  # Very short duration
-        "type": 1
-    }
-    
-    result = call_tuya_api_v2(
-        f"/v2.0/cloud/thing/{DEVICE_ID}/shadow/properties/desired", 
-        "POST", 
-        payload
-    )
-    
-    return jsonify({
-        "action": "clear_commands",
-        "command": "Clear all desired properties",
-        "result": result
-    })
-
 @app.route("/signature_test")
 def signature_test():
     """Test signature generation"""
@@ -613,108 +449,10 @@ def device_commands():
         ]
     })
 
-@app.route("/quick_click")
-def quick_click():
-    """Quick click with minimal hold time"""
-    payload = {
-        "properties": json.dumps({
-            "arm_down_percent": 100,
-            "arm_up_percent": 100,
-            "click_sustain_time": 1,  # 1 second hold
-            "switch": True,
-            "mode": "click"
-        }),
-        "duration": 3600,
-        "type": 1
-    }
-    
-    result = call_tuya_api_v2(
-        f"/v2.0/cloud/thing/{DEVICE_ID}/shadow/properties/desired", 
-        "POST", 
-        payload
-    )
-    
-    return jsonify({
-        "action": "quick_click",
-        "command": "Quick press and release (1s hold)",
-        "parameters": {
-            "arm_down_percent": 100,
-            "arm_up_percent": 100,
-            "click_sustain_time": 1,
-            "switch": True,
-            "mode": "click"
-        },
-        "result": result
-    })
-
-@app.route("/long_press")
-def long_press():
-    """Long press with maximum hold time"""
-    payload = {
-        "properties": json.dumps({
-            "arm_down_percent": 100,
-            "arm_up_percent": 100,
-            "click_sustain_time": 10,  # 10 seconds hold (maximum)
-            "switch": True,
-            "mode": "click"
-        }),
-        "duration": 3600,
-        "type": 1
-    }
-    
-    result = call_tuya_api_v2(
-        f"/v2.0/cloud/thing/{DEVICE_ID}/shadow/properties/desired", 
-        "POST", 
-        payload
-    )
-    
-    return jsonify({
-        "action": "long_press",
-        "command": "Long press and release (10s hold)",
-        "parameters": {
-            "arm_down_percent": 100,
-            "arm_up_percent": 100,
-            "click_sustain_time": 10,
-            "switch": True,
-            "mode": "click"
-        },
-        "result": result
-    })
-
-@app.route("/half_press")
-def half_press():
-    """Half press - arm at 50% position"""
-    payload = {
-        "properties": json.dumps({
-            "arm_down_percent": 50,   # Half down
-            "arm_up_percent": 50,     # Half up
-            "switch": True
-        }),
-        "duration": 3600,
-        "type": 1
-    }
-    
-    result = call_tuya_api_v2(
-        f"/v2.0/cloud/thing/{DEVICE_ID}/shadow/properties/desired", 
-        "POST", 
-        payload
-    )
-    
-    return jsonify({
-        "action": "half_press",
-        "command": "Set arm to 50% position",
-        "parameters": {
-            "arm_down_percent": 50,
-            "arm_up_percent": 50,
-            "switch": True
-        },
-        "result": result
-    })
-
 @app.route("/battery_status")
 def battery_status():
     """Get battery status and charging information"""
-    result = call_tuya_api_v2(f"/v1.0/devices/{DEVICE_ID}/status")
+    result = call_device_api(f"/v1.0/devices/{DEVICE_ID}/status")
     
     battery_info = {}
     if result.get("success") and "result" in result:
@@ -767,6 +505,10 @@ if __name__ == "__main__":
     print("   • /test - Тест подключения")
     print("")
     
+    # Warm up keep-alive connection before the first click
+    http_pool.start_reaper()
+    http_pool.warm_up(BASE_URL)
+    
     # Test connection on startup
     test_token = get_access_token()
     if test_token:
@@ -775,4 +517,10 @@ if __name__ == "__main__":
     else:
         print("⚠️  Проблемы с получением токена")
     
-    app.run(host="0.0.0.0", port=80, debug=True)
+    # Отладчик Werkzeug позволяет выполнить код на сервере - только явно и не в продакшене.
+    # Для продакшена: gunicorn -w 2 --threads 8 -b 0.0.0.0:80 fingerbot:app
+    app.run(
+        host="0.0.0.0",
+        port=int(os.getenv("FINGERBOT_PORT", "80")),
+        debug=os.getenv("FLASK_DEBUG") == "1"
+    )
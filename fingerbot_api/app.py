@@ -1,58 +1,55 @@
-from flask import Flask, jsonify, request
-import json
-from tuya_client import call_tuya_api_v2, get_access_token
-from config import DEVICE_ID
+import time
+from functools import wraps
+from flask import Flask, Response, jsonify, request, g
+from tuya_client import (
+    get_access_token, warm_up_connections, start_token_renewer, rate_limiter, circuit_breaker
+)
+from dispatcher import QueueFull
+import metrics
+from log_setup import setup_logging
+import device_control
+from device_control import (
+    status_cache, battery_monitor, device_state, registry, get_device_status, get_battery_info
+)
+from config import DEVICE_ID, TUYA_WARMUP, TUYA_MQ, API_HOST, API_PORT, LOG_LEVEL, LOG_FORMAT
+
+# Настраивается при импорте, чтобы действовало и под gunicorn (wsgi.py)
+setup_logging(LOG_LEVEL, LOG_FORMAT)
 
 app = Flask(__name__)
 
-def get_battery_info():
-    """Получить информацию о батарее устройства"""
-    result = call_tuya_api_v2(f"/v1.0/devices/{DEVICE_ID}/status")
-    
-    battery_data = {
-        "battery_level": "Неизвестно",
-        "battery_percentage": None,
-        "charging_status": "Неизвестно",
-        "is_charging": False,
-        "battery_health": "Неизвестно"
-    }
-    
-    if result.get("success") and "result" in result:
-        for status in result["result"]:
-            if status["code"] == "battery_percentage":
-                battery_percentage = status["value"]
-                battery_data["battery_percentage"] = battery_percentage
-                battery_data["battery_level"] = f"{battery_percentage}%"
-                
-                # Определяем состояние батареи
-                if battery_percentage >= 80:
-                    battery_data["battery_health"] = "🔋 Отлично"
-                elif battery_percentage >= 50:
-                    battery_data["battery_health"] = "🔋 Хорошо"
-                elif battery_percentage >= 20:
-                    battery_data["battery_health"] = "🔋 Средне"
-                else:
-                    battery_data["battery_health"] = "🔋 Низкий заряд"
-                    
-            elif status["code"] in ["charge_state", "charge_status"]:
-                charge_state = status["value"]
-                battery_data["charging_status"] = charge_state
-                
-                # Улучшенная обработка статусов зарядки
-                if charge_state == "charging" or charge_state == "1":
-                    battery_data["charging_status"] = "⚡ Заряжается"
-                    battery_data["is_charging"] = True
-                elif charge_state == "not_charging" or charge_state == "0":
-                    battery_data["charging_status"] = "🔌 Не заряжается"
-                    battery_data["is_charging"] = False
-                elif charge_state == "charge_done":
-                    battery_data["charging_status"] = "✅ Зарядка завершена"
-                    battery_data["is_charging"] = False
-                else:
-                    battery_data["charging_status"] = f"❓ {charge_state}"
-                    battery_data["is_charging"] = False
-    
-    return battery_data
+# Метрики маршрутов: число запросов по коду ответа и время обработки
+http_requests_total = metrics.registry.counter(
+    "http_requests_total", "Запросы к API по маршрутам", labels=("route", "method", "status")
+)
+http_request_seconds = metrics.registry.histogram(
+    "http_request_seconds", "Время обработки запроса к API", labels=("route",)
+)
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    http_requests_total.inc(route=route, method=request.method, status=response.status_code)
+    if "started" in g:
+        http_request_seconds.observe(time.perf_counter() - g.started, route=route)
+    return response
+
+@app.errorhandler(QueueFull)
+def queue_full(e):
+    """Очередь устройства переполнена - просим клиента повторить позже"""
+    response = jsonify({
+        "success": False,
+        "error": "Device queue is full",
+        "device_id": e.device_id,
+        "pending": e.depth
+    })
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
 
 @app.route("/")
 def home():
@@ -61,10 +58,18 @@ def home():
         "device": "CUBETOUCH II",
         "endpoints": [
             "/test - Проверка подключения",
-            "/quick_click - Быстрый клик",
+            "/quick_click - Быстрый клик (?confirm=1 - с подтверждением)",
             "/device_status - Статус устройства",
             "/battery_status - Проверить заряд батареи",
-            "/check_battery - Проверить заряд (для бота)"
+            "/check_battery - Проверить заряд (для бота)",
+            "/battery_history - Мониторинг батареи и история заряда",
+            "/cache_stats - Статистика кэша статуса",
+            "/rate_limits - Оставшийся бюджет вызовов Tuya",
+            "/metrics - Метрики в формате Prometheus",
+            "/push_status - Подписка на push-события Tuya",
+            "/devices - Реестр устройств (?apartment=...)",
+            "/devices/status - Статус и заряд многих устройств (?ids=a,b,c, по умолчанию все)",
+            "/devices/<id>/quick_click|device_status|battery_status|check_battery - То же для устройства"
         ]
     })
 
@@ -75,40 +80,24 @@ def test():
     return jsonify({
         "token_available": bool(token),
         "device_id": DEVICE_ID,
+        "circuit_breaker": circuit_breaker.status(),
         "message": "✅ Подключение успешно!" if token else "❌ Ошибка подключения"
     })
 
+def confirm_arg():
+    """Параметр ?confirm=1/0 (None - по умолчанию из CLICK_CONFIRM)"""
+    confirm = request.args.get("confirm")
+    return confirm == "1" if confirm is not None else None
+
 @app.route("/quick_click")
 def quick_click():
-    """Быстрый клик - основная функция"""
-    payload = {
-        "properties": json.dumps({
-            "arm_down_percent": 100,
-            "arm_up_percent": 100,
-            "click_sustain_time": 1,
-            "switch": True,
-            "mode": "click"
-        }),
-        "duration": 3600,
-        "type": 1
-    }
-    
-    result = call_tuya_api_v2(
-        f"/v2.0/cloud/thing/{DEVICE_ID}/shadow/properties/desired", 
-        "POST", 
-        payload
-    )
-    
-    return jsonify({
-        "action": "quick_click",
-        "success": result.get("success", False),
-        "result": result
-    })
+    """Быстрый клик - основная функция (?confirm=1 - дождаться подтверждения устройства)"""
+    return jsonify(device_control.quick_click(confirm=confirm_arg()))
 
 @app.route("/device_status")
 def device_status():
     """Статус устройства"""
-    result = call_tuya_api_v2(f"/v1.0/devices/{DEVICE_ID}/status")
+    result = get_device_status()
     return jsonify(result)
 
 @app.route("/battery_status")
@@ -124,34 +113,116 @@ def battery_status():
 @app.route("/check_battery")
 def check_battery():
     """Проверить заряд - оптимизировано для Telegram бота"""
-    battery_data = get_battery_info()
-    
-    # Форматируем сообщение для Telegram
-    if battery_data["battery_percentage"] is not None:
-        message = f"🔋 *Состояние батареи:*\n\n"
-        message += f"• Уровень заряда: {battery_data['battery_level']}\n"
-        message += f"• Статус зарядки: {battery_data['charging_status']}\n"
-        message += f"• Состояние: {battery_data['battery_health']}\n"
-        
-        # Добавляем рекомендации
-        if battery_data["battery_percentage"] <= 20:
-            message += "\n⚠️ *Рекомендуется зарядить устройство*"
-        elif battery_data["battery_percentage"] <= 10:
-            message += "\n🔴 *НИЗКИЙ ЗАРЯД! Срочно зарядите устройство*"
-        elif battery_data["is_charging"]:
-            message += "\n⚡ *Устройство заряжается*"
+    return jsonify(device_control.check_battery())
+
+@app.route("/battery_history")
+def battery_history():
+    """Фоновый мониторинг батареи: последнее показание и история"""
+    return jsonify(battery_monitor.status())
+
+@app.route("/cache_stats")
+def cache_stats():
+    """Статистика кэша статуса устройства"""
+    return jsonify(status_cache.stats())
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Метрики в формате Prometheus"""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route("/rate_limits")
+def rate_limits():
+    """Оставшийся бюджет вызовов Tuya API"""
+    return jsonify(rate_limiter.status())
+
+def registered_device(view):
+    """Маршрут устройства из реестра: неизвестный device_id - 404"""
+    @wraps(view)
+    def wrapper(device_id):
+        if device_id not in registry:
+            response = jsonify({"success": False, "error": "Unknown device", "device_id": device_id})
+            response.status_code = 404
+            return response
+        return view(device_id)
+    return wrapper
+
+@app.route("/devices")
+def devices():
+    """Реестр устройств"""
+    return jsonify({"devices": registry.list(request.args.get("apartment"))})
+
+@app.route("/devices/status", methods=["GET", "POST"])
+def devices_status():
+    """Статус и заряд многих устройств пакетными запросами Tuya"""
+    if request.method == "POST":
+        body = request.get_json(silent=True)
+        device_ids = body.get("device_ids") if isinstance(body, dict) else None
+        if not isinstance(device_ids, list) or not all(isinstance(device_id, str) for device_id in device_ids):
+            response = jsonify({"success": False, "error": "device_ids must be a list of strings"})
+            response.status_code = 400
+            return response
+    elif request.args.get("ids"):
+        device_ids = [device_id for device_id in request.args["ids"].split(",") if device_id]
     else:
-        message = "❓ *Информация о батарее недоступна*\n\nПроверьте подключение устройства"
+        device_ids = [device["device_id"] for device in registry.list()]
+    
+    # Как и /devices/<id>/...: только устройства из реестра
+    unknown = [device_id for device_id in device_ids if device_id not in registry]
+    if unknown:
+        response = jsonify({"success": False, "error": "Unknown device", "device_ids": unknown})
+        response.status_code = 404
+        return response
     
+    result = device_control.get_devices_status(device_ids)
+    for device_id, status in result["devices"].items():
+        battery_data = device_control.parse_battery_info(status)
+        result["devices"][device_id] = dict(status, battery_percentage=battery_data["battery_percentage"])
+    return jsonify(result)
+
+@app.route("/devices/<device_id>")
+@registered_device
+def device_info(device_id):
+    """Метаданные устройства"""
+    return jsonify(registry.get(device_id))
+
+@app.route("/devices/<device_id>/quick_click")
+@registered_device
+def device_quick_click(device_id):
+    """Быстрый клик на устройстве"""
+    return jsonify(device_control.quick_click(confirm=confirm_arg(), device_id=device_id))
+
+@app.route("/devices/<device_id>/device_status")
+@registered_device
+def device_device_status(device_id):
+    """Статус устройства"""
+    return jsonify(get_device_status(device_id))
+
+@app.route("/devices/<device_id>/battery_status")
+@registered_device
+def device_battery_status(device_id):
+    """Заряд батареи устройства - детальная информация"""
     return jsonify({
-        "success": True,
-        "message": message,
-        "battery_data": battery_data
+        "device_id": device_id,
+        "battery_info": get_battery_info(device_id)
     })
 
+@app.route("/devices/<device_id>/check_battery")
+@registered_device
+def device_check_battery(device_id):
+    """Заряд устройства - ответ для Telegram бота"""
+    return jsonify(device_control.check_battery(device_id))
+
+@app.route("/push_status")
+def push_status():
+    """Подписка на push-события Tuya и состояние устройств из них"""
+    subscriber = device_control.push_subscriber
+    if subscriber is None:
+        return jsonify({"enabled": False, "state": device_state.stats()})
+    return jsonify(dict(subscriber.status(), enabled=True))
+
 if __name__ == "__main__":
     print("🚀 Запуск FingerBot API - Обновленная система...")
-    print(f"📱 Устройство: {DEVICE_ID}")
+    print(f"📱 Устройство: {DEVICE_ID} (всего в реестре: {len(registry)})")
     print("")
     print("🎯 Доступные эндпоинты:")
     print("   • /test - Проверка подключения")
@@ -159,8 +230,20 @@ if __name__ == "__main__":
     print("   • /device_status - Статус устройства")
     print("   • /battery_status - Проверить заряд (детально)")
     print("   • /check_battery - Проверить заряд (для бота)")
+    print("   • /battery_history - Мониторинг батареи и история заряда")
+    print("   • /cache_stats - Статистика кэша статуса")
+    print("   • /rate_limits - Оставшийся бюджет вызовов Tuya")
+    print("   • /metrics - Метрики в формате Prometheus")
+    print("   • /push_status - Подписка на push-события Tuya")
+    print("   • /devices - Реестр устройств")
+    print("   • /devices/status - Статус и заряд многих устройств")
+    print("   • /devices/<id>/quick_click - Быстрый клик на устройстве (и другие маршруты)")
     print("")
     
+    # Прогреваем соединение с Tuya Cloud, чтобы первый клик не ждал TLS
+    if TUYA_WARMUP:
+        warm_up_connections()
+    
     # Тестируем подключение при запуске
     token = get_access_token()
     if token:
@@ -177,5 +260,14 @@ if __name__ == "__main__":
     else:
         print("❌ Подключение к Tuya Cloud: ОШИБКА")
     
-    print(f"\n🌐 API доступно по: http://192.168.1.35:5001")
-    app.run(host="0.0.0.0", port=5001, debug=False)
+    # Токен обновляется в фоне, клики не ждут его получения
+    start_token_renewer()
+    # Статус приходит push-событиями, опрос Tuya нужен только для первого снимка
+    if TUYA_MQ:
+        device_control.start_push_subscriber()
+    # Заряд опрашивается в фоне, админы получают оповещения о низком заряде
+    device_control.start_battery_monitor()
+    
+    print(f"\n🌐 API доступно по: http://192.168.1.35:{API_PORT}")
+    # Для продакшена: gunicorn -c gunicorn.conf.py wsgi:app (или async_app.py)
+    app.run(host=API_HOST, port=API_PORT, debug=False)
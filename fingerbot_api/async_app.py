@@ -0,0 +1,174 @@
+# Асинхронный вариант FingerBot API на aiohttp.web: маршруты ждут AsyncTuyaClient,
+# не занимая поток на каждый вызов Tuya. Запуск: python async_app.py
+import asyncio
+import time
+from aiohttp import web
+
+import metrics
+from log_setup import setup_logging
+from async_tuya_client import AsyncTuyaClient
+from tuya_client import start_token_renewer
+from status_cache import StatusCache
+from commands import COMMANDS
+from battery_info import parse_battery_info, format_battery_message
+from config import (
+    DEVICE_ID, TUYA_WARMUP, STATUS_CACHE_TTL, CLICK_DEBOUNCE_WINDOW,
+    API_HOST, API_PORT, LOG_LEVEL, LOG_FORMAT
+)
+
+setup_logging(LOG_LEVEL, LOG_FORMAT)
+
+# Свежий статус из кэша, промах - один запрос (одинаковые GET объединяет клиент)
+status_cache = StatusCache(ttl=STATUS_CACHE_TTL, stale_ttl=0)
+
+# Выполняющиеся и недавние клики: (задача, время отправки)
+click_tasks = {}
+
+# Те же метрики маршрутов, что и в app.py
+http_requests_total = metrics.registry.counter(
+    "http_requests_total", "Запросы к API по маршрутам", labels=("route", "method", "status")
+)
+http_request_seconds = metrics.registry.histogram(
+    "http_request_seconds", "Время обработки запроса к API", labels=("route",)
+)
+# Метрики кэша - по собственному кэшу этого приложения
+metrics.registry.gauge(
+    "status_cache_hit_ratio", "Доля запросов статуса, отданных из кэша",
+    lambda: status_cache.stats()["hit_ratio"]
+)
+metrics.registry.gauge(
+    "status_cache_requests", "Запросы статуса по результату в кэше",
+    lambda: {key: value for key, value in status_cache.stats().items() if key in ("hits", "stale_hits", "misses")},
+    label="result"
+)
+
+
+@web.middleware
+async def record_request(request, handler):
+    route = request.match_info.route.resource.canonical if request.match_info.route.resource else "unmatched"
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        http_requests_total.inc(route=route, method=request.method, status=status)
+        http_request_seconds.observe(time.perf_counter() - started, route=route)
+
+
+async def get_device_status(client, device_id=DEVICE_ID):
+    """Статус устройства (через кэш)"""
+    cached = status_cache.peek(device_id)
+    if cached is not None:
+        return cached
+    result = await client.call(f"/v1.0/devices/{device_id}/status")
+    status_cache.set(device_id, result)
+    return result
+
+
+async def send_quick_click(client, device_id=DEVICE_ID):
+    """Быстрый клик; повторный клик в окне debounce получает результат первого"""
+    key = (device_id, "quick_click")
+    entry = click_tasks.get(key)
+    if entry is not None:
+        task, started = entry
+        fresh = time.monotonic() - started < CLICK_DEBOUNCE_WINDOW
+        if not task.done() or (fresh and task.result().get("success")):
+            return await asyncio.shield(task), True
+
+    task = asyncio.ensure_future(client.call(
+        f"/v2.0/cloud/thing/{device_id}/shadow/properties/desired",
+        "POST",
+        COMMANDS["quick_click"].prepared
+    ))
+    click_tasks[key] = (task, time.monotonic())
+    result = await asyncio.shield(task)
+    if result.get("success"):
+        status_cache.invalidate(device_id)
+    return result, False
+
+
+async def home(request):
+    return web.json_response({
+        "status": "FingerBot API (async)",
+        "device": "CUBETOUCH II",
+        "endpoints": ["/quick_click", "/device_status", "/battery_status", "/check_battery", "/metrics"]
+    })
+
+
+async def quick_click(request):
+    """Быстрый клик - основная функция"""
+    result, deduplicated = await send_quick_click(request.app["tuya"])
+    return web.json_response({
+        "action": "quick_click",
+        "device_id": DEVICE_ID,
+        "success": result.get("success", False),
+        "deduplicated": deduplicated,
+        "result": result
+    })
+
+
+async def device_status(request):
+    """Статус устройства"""
+    return web.json_response(await get_device_status(request.app["tuya"]))
+
+
+async def battery_status(request):
+    """Проверить заряд батареи - детальная информация"""
+    result = await get_device_status(request.app["tuya"])
+    return web.json_response({
+        "device": "CUBETOUCH II",
+        "battery_info": parse_battery_info(result)
+    })
+
+
+async def check_battery(request):
+    """Проверить заряд - ответ для Telegram бота"""
+    battery_data = parse_battery_info(await get_device_status(request.app["tuya"]))
+    return web.json_response({
+        "success": True,
+        "message": format_battery_message(battery_data),
+        "battery_data": battery_data
+    })
+
+
+async def metrics_endpoint(request):
+    """Метрики в формате Prometheus"""
+    return web.Response(body=metrics.registry.render().encode("utf-8"), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+
+async def on_startup(app):
+    """Общий клиент Tuya: прогрев соединения и токен до первого клика"""
+    client = AsyncTuyaClient()
+    if TUYA_WARMUP:
+        await client.warm_up()
+    await client.get_access_token()
+    # Токен общий с синхронным клиентом: его фоновое обновление работает и здесь
+    start_token_renewer()
+    app["tuya"] = client
+
+
+async def on_cleanup(app):
+    await app["tuya"].close()
+
+
+def create_app():
+    app = web.Application(middlewares=[record_request])
+    app.router.add_get("/", home)
+    app.router.add_get("/quick_click", quick_click)
+    app.router.add_get("/device_status", device_status)
+    app.router.add_get("/battery_status", battery_status)
+    app.router.add_get("/check_battery", check_battery)
+    app.router.add_get("/metrics", metrics_endpoint)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+if __name__ == "__main__":
+    print(f"🚀 Запуск FingerBot API (async) на {API_HOST}:{API_PORT}")
+    web.run_app(create_app(), host=API_HOST, port=API_PORT, keepalive_timeout=30)
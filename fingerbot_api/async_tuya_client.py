@@ -0,0 +1,302 @@
+import asyncio
+import json
+import logging
+import aiohttp
+from tuya_client import (
+    generate_signature, sign_request, build_url, get_base_url,
+    peek_access_token, store_access_token, load_shared_access_token, shared_token_lock,
+    rate_limiter, rate_limit_kind, rate_limited_response,
+    TIMEOUTS, circuit_breaker, circuit_open_response,
+    endpoint_label, token_fetch_seconds, tuya_request_seconds, json_decode_seconds, tuya_requests_total
+)
+from resilience import CircuitOpenError, backoff_delay
+from signature import serialize_body
+from config import (
+    CLIENT_ID, TUYA_POOL_SIZE, TUYA_POOL_IDLE_TIMEOUT,
+    TUYA_MAX_RETRIES, TUYA_RETRY_BACKOFF, TUYA_RETRY_BACKOFF_MAX
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTuyaClient:
+    """Асинхронный клиент Tuya Cloud на aiohttp с той же схемой подписи"""
+
+    def __init__(self, base_url=None, pool_size=TUYA_POOL_SIZE, timeout=10):
+        self.base_url = base_url or get_base_url()
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session = None
+        self._token_lock = asyncio.Lock()
+        # Выполняющиеся GET-запросы: одинаковые вызовы ждут одну задачу
+        self._inflight_reads = {}
+        self.coalesced = 0
+
+    def _get_session(self):
+        """Получить общую keep-alive сессию клиента"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                keepalive_timeout=TUYA_POOL_IDLE_TIMEOUT,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def warm_up(self):
+        """Заранее установить TCP + TLS соединение с Tuya Cloud"""
+        try:
+            async with self._get_session().head(self.base_url):
+                return True
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("⚠️ Не удалось прогреть соединение с %s: %s", self.base_url, e)
+            return False
+
+    async def close(self):
+        """Закрыть сессию клиента"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _request(self, kind, method, path, make_headers, body, idempotent):
+        """Запрос с повторами и через общий circuit breaker: (status, json или текст).
+
+        Политика та же, что у send_with_retries: чтения повторяются при таймаутах,
+        ошибках соединения и 5xx, записи - только если соединение не было установлено.
+        """
+        connect_timeout, read_timeout = TIMEOUTS[kind]
+        timeout = aiohttp.ClientTimeout(
+            total=self.timeout.total,
+            sock_connect=connect_timeout,
+            sock_read=read_timeout
+        )
+        attempt = 0
+        while True:
+            if not circuit_breaker.allow():
+                raise CircuitOpenError(circuit_breaker.retry_after())
+
+            try:
+                # Заголовки строятся на каждую попытку: свежие t и nonce в подписи
+                async with self._get_session().request(
+                    method,
+                    f"{self.base_url}{path}",
+                    headers=make_headers(),
+                    data=body,
+                    timeout=timeout
+                ) as response:
+                    status = response.status
+                    if status == 200:
+                        raw = await response.read()
+                        with json_decode_seconds.time():
+                            data = json.loads(raw)
+                    else:
+                        data = await response.text()
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
+                circuit_breaker.record_failure()
+                not_sent = isinstance(e, aiohttp.ClientConnectorError)
+                # Каждый повтор берет свой слот в лимитах Tuya
+                if attempt < TUYA_MAX_RETRIES and (idempotent or not_sent) and await self._wait_rate_limit(kind):
+                    attempt += 1
+                    await asyncio.sleep(backoff_delay(attempt, TUYA_RETRY_BACKOFF, TUYA_RETRY_BACKOFF_MAX))
+                    continue
+                raise
+            except Exception:
+                # ClientPayloadError, не-JSON тело ответа и т.п.: проба тоже должна завершиться,
+                # иначе breaker навсегда останется полуоткрытым
+                circuit_breaker.record_failure()
+                raise
+            except BaseException:
+                # Отмена запроса (CancelledError) - не сбой облака
+                circuit_breaker.release()
+                raise
+
+            if status >= 500:
+                circuit_breaker.record_failure()
+                if attempt < TUYA_MAX_RETRIES and idempotent and await self._wait_rate_limit(kind):
+                    attempt += 1
+                    await asyncio.sleep(backoff_delay(attempt, TUYA_RETRY_BACKOFF, TUYA_RETRY_BACKOFF_MAX))
+                    continue
+                return status, data
+
+            circuit_breaker.record_success()
+            return status, data
+
+    async def _wait_rate_limit(self, kind):
+        """Дождаться слота в общих с синхронным клиентом лимитах, не блокируя цикл событий"""
+        wait = rate_limiter.reserve(kind)
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    async def get_access_token(self):
+        """Получить токен доступа (одновременные вызовы ждут один запрос)"""
+        # Токен общий с синхронным клиентом, его фоновым обновлением и другими процессами
+        token = peek_access_token()
+        if token:
+            return token
+
+        async with self._token_lock:
+            # Токен мог обновить другой вызов, пока мы ждали блокировку
+            token = peek_access_token() or load_shared_access_token()
+            if token:
+                return token
+
+            # Как refresh_access_token: новый токен получает один процесс хоста,
+            # остальные после блокировки берут его из общего хранилища
+            lock = shared_token_lock()
+            await self._enter_lock(lock)
+            try:
+                token = await asyncio.to_thread(load_shared_access_token)
+                if token:
+                    return token
+                return await self._fetch_access_token()
+            finally:
+                lock.__exit__(None, None, None)
+
+    async def _enter_lock(self, lock):
+        """Взять блокирующую блокировку в отдельном потоке, не останавливая цикл событий"""
+        entering = asyncio.ensure_future(asyncio.to_thread(lock.__enter__))
+        try:
+            await asyncio.shield(entering)
+        except asyncio.CancelledError:
+            # Поток все равно возьмет блокировку - отпускаем ее, как только возьмет
+            entering.add_done_callback(lambda _: lock.__exit__(None, None, None))
+            raise
+
+    async def _fetch_access_token(self):
+        """Запросить новый токен у Tuya Cloud"""
+        if not await self._wait_rate_limit("token"):
+            logger.error("❌ Лимит запросов токена исчерпан")
+            return None
+
+        try:
+            url = build_url("/v1.0/token", {"grant_type": "1"})
+
+            def make_headers():
+                signature, t, nonce = generate_signature("GET", url, None)
+                return {
+                    "client_id": CLIENT_ID or "",
+                    "sign": signature,
+                    "t": t,
+                    "nonce": nonce,
+                    "sign_method": "HMAC-SHA256"
+                }
+
+            with token_fetch_seconds.time():
+                status, data = await self._request("token", "GET", url, make_headers, None, idempotent=True)
+            tuya_requests_total.inc(endpoint="/v1.0/token", method="GET", status=status)
+            if status != 200:
+                logger.error("❌ Ошибка получения токена: HTTP %s", status)
+                return None
+
+            if data.get("success"):
+                store_access_token(data["result"]["access_token"], data["result"]["expire_time"])
+                return data["result"]["access_token"]
+
+            logger.error("❌ Ошибка получения токена: %s", data.get("msg", "Unknown error"))
+            return None
+
+        except CircuitOpenError as e:
+            logger.error("❌ Tuya Cloud недоступен, повтор через %.0f с", e.retry_after)
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Сетевые сбои штатны во время аварии облака - без трассировки на каждую попытку
+            logger.error("❌ Не удалось получить токен: %s", str(e) or type(e).__name__)
+            return None
+        except Exception as e:
+            logger.exception("❌ Исключение при получении токена: %s", e)
+            return None
+
+    async def call(self, endpoint, method="GET", payload=None, params=None, idempotent=None):
+        """Асинхронный вызов Tuya API v2.0 (аналог call_tuya_api_v2)"""
+        if idempotent is None:
+            idempotent = method == "GET"
+        if method != "GET":
+            return await self._call(endpoint, method, payload, params, idempotent)
+
+        key = build_url(endpoint, params)
+        task = self._inflight_reads.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call(endpoint, method, payload, params, idempotent))
+            self._inflight_reads[key] = task
+            task.add_done_callback(lambda _: self._inflight_reads.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: отмена одного ожидающего не отменяет запрос для остальных
+        return await asyncio.shield(task)
+
+    async def _call(self, endpoint, method, payload, params, idempotent):
+        """Выполнить один подписанный запрос к Tuya API (с повторами)"""
+        if method not in ("GET", "POST"):
+            return {"success": False, "error": f"Unsupported method: {method}"}
+
+        token = await self.get_access_token()
+        if not token:
+            return {"success": False, "error": "Failed to get access token"}
+
+        kind = rate_limit_kind(method)
+        label = endpoint_label(endpoint)
+        if not await self._wait_rate_limit(kind):
+            tuya_requests_total.inc(endpoint=label, method=method, status="rate_limited")
+            return rate_limited_response()
+
+        status = "error"
+        try:
+            url = build_url(endpoint, params)
+
+            # Тело сериализуется один раз: подписываем ровно те байты, что уйдут в запрос
+            body, body_sha256 = serialize_body(payload if method == "POST" else None)
+
+            def make_headers():
+                signature, t, nonce = sign_request(method, url, body_sha256, token)
+                return {
+                    "client_id": CLIENT_ID or "",
+                    "access_token": token,
+                    "sign": signature,
+                    "t": t,
+                    "nonce": nonce,
+                    "sign_method": "HMAC-SHA256",
+                    "Content-Type": "application/json"
+                }
+
+            with tuya_request_seconds.time(endpoint=label, method=method):
+                status, data = await self._request(
+                    kind,
+                    method,
+                    url,
+                    make_headers,
+                    body,
+                    idempotent
+                )
+            if status == 200:
+                return data
+            return {
+                "success": False,
+                "error": f"HTTP {status}",
+                "response": data[:200]
+            }
+
+        except CircuitOpenError as e:
+            status = "circuit_open"
+            return circuit_open_response(e.retry_after)
+        except asyncio.TimeoutError:
+            status = "timeout"
+            return {"success": False, "error": "Request timeout"}
+        except aiohttp.ClientConnectionError:
+            status = "connection_error"
+            return {"success": False, "error": "Connection error"}
+        except aiohttp.ClientError as e:
+            return {"success": False, "error": f"Request exception: {str(e)}"}
+        except Exception as e:
+            return {"success": False, "error": f"Unexpected error: {str(e)}"}
+        finally:
+            tuya_requests_total.inc(endpoint=label, method=method, status=status)
@@ -0,0 +1,74 @@
+# Разбор и форматирование заряда батареи из ответа /status.
+# Модуль без побочных эффектов: его используют device_control.py и async_app.py.
+
+# Пороги заряда для рекомендаций и оповещений (%)
+BATTERY_LOW_THRESHOLD = 20
+BATTERY_CRITICAL_THRESHOLD = 10
+
+
+def parse_battery_info(result):
+    """Информация о батарее из ответа /status"""
+    battery_data = {
+        "battery_level": "Неизвестно",
+        "battery_percentage": None,
+        "charging_status": "Неизвестно",
+        "is_charging": False,
+        "battery_health": "Неизвестно"
+    }
+    
+    if result.get("success") and "result" in result:
+        for status in result["result"]:
+            if status["code"] == "battery_percentage":
+                battery_percentage = status["value"]
+                battery_data["battery_percentage"] = battery_percentage
+                battery_data["battery_level"] = f"{battery_percentage}%"
+                
+                # Определяем состояние батареи
+                if battery_percentage >= 80:
+                    battery_data["battery_health"] = "🔋 Отлично"
+                elif battery_percentage >= 50:
+                    battery_data["battery_health"] = "🔋 Хорошо"
+                elif battery_percentage >= BATTERY_LOW_THRESHOLD:
+                    battery_data["battery_health"] = "🔋 Средне"
+                else:
+                    battery_data["battery_health"] = "🔋 Низкий заряд"
+                    
+            elif status["code"] in ["charge_state", "charge_status"]:
+                charge_state = status["value"]
+                battery_data["charging_status"] = charge_state
+                
+                # Улучшенная обработка статусов зарядки
+                if charge_state == "charging" or charge_state == "1":
+                    battery_data["charging_status"] = "⚡ Заряжается"
+                    battery_data["is_charging"] = True
+                elif charge_state == "not_charging" or charge_state == "0":
+                    battery_data["charging_status"] = "🔌 Не заряжается"
+                    battery_data["is_charging"] = False
+                elif charge_state == "charge_done":
+                    battery_data["charging_status"] = "✅ Зарядка завершена"
+                    battery_data["is_charging"] = False
+                else:
+                    battery_data["charging_status"] = f"❓ {charge_state}"
+                    battery_data["is_charging"] = False
+    
+    return battery_data
+
+
+def format_battery_message(battery_data):
+    """Сообщение о батарее для Telegram (Markdown)"""
+    if battery_data["battery_percentage"] is None:
+        return "❓ *Информация о батарее недоступна*\n\nПроверьте подключение устройства"
+    
+    message = f"🔋 *Состояние батареи:*\n\n"
+    message += f"• Уровень заряда: {battery_data['battery_level']}\n"
+    message += f"• Статус зарядки: {battery_data['charging_status']}\n"
+    message += f"• Состояние: {battery_data['battery_health']}\n"
+    
+    # Добавляем рекомендации
+    if battery_data["battery_percentage"] <= BATTERY_CRITICAL_THRESHOLD:
+        message += "\n🔴 *НИЗКИЙ ЗАРЯД! Срочно зарядите устройство*"
+    elif battery_data["battery_percentage"] <= BATTERY_LOW_THRESHOLD:
+        message += "\n⚠️ *Рекомендуется зарядить устройство*"
+    elif battery_data["is_charging"]:
+        message += "\n⚡ *Устройство заряжается*"
+    return message
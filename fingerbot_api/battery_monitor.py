@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class BatteryMonitor:
+    """Фоновый опрос батареи с адаптивным интервалом, историей и оповещениями о порогах
+
+    read_battery() возвращает словарь как get_battery_info().
+    Опрос редкий при высоком заряде и частый у порогов или во время зарядки.
+    should_poll() решает, опрашивать ли в этом процессе (один опрос на несколько воркеров).
+    Последний оповещенный порог хранится в state_path: перезапуск не повторяет оповещение.
+    """
+
+    def __init__(self, read_battery, thresholds=(20, 10), slow_interval=1800,
+                 fast_interval=300, charging_interval=600, near_margin=10, history_size=288,
+                 should_poll=None, state_path=None):
+        self.read_battery = read_battery
+        self.state_path = state_path
+        self.should_poll = should_poll or (lambda: True)
+        self.thresholds = sorted(thresholds, reverse=True)
+        self.slow_interval = slow_interval
+        self.fast_interval = fast_interval
+        self.charging_interval = charging_interval
+        self.near_margin = near_margin
+        self.history = deque(maxlen=history_size)
+        self._latest = None
+        self._latest_at = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.polls = 0
+        self.errors = 0
+        self.alerted = self._load_alerted()
+
+    def _load_alerted(self):
+        if not self.state_path:
+            return None
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f).get("alerted")
+        except (OSError, ValueError):
+            return None
+
+    def _save_alerted(self):
+        if not self.state_path:
+            return
+        try:
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"alerted": self.alerted}, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.warning("⚠️ Не удалось сохранить состояние оповещений о батарее: %s", e)
+
+    def add_listener(self, callback):
+        """Подписаться на пересечение порогов: callback(event, threshold, battery_data),
+        event - "low" (заряд опустился до порога) или "recovered" (поднялся выше верхнего)"""
+        self._listeners.append(callback)
+
+    def next_interval(self, battery_data):
+        """Интервал до следующего опроса по последнему показанию"""
+        percentage = battery_data.get("battery_percentage") if battery_data else None
+        if percentage is None:
+            return self.fast_interval
+        if battery_data.get("is_charging"):
+            return self.charging_interval
+        if percentage <= self.thresholds[0] + self.near_margin:
+            return self.fast_interval
+        return self.slow_interval
+
+    def crossings(self, alerted, current):
+        """События по показанию current и последнему оповещенному порогу alerted (None - тревоги нет).
+
+        Возвращает (события, новый alerted). О нескольких порогах сразу - одно событие
+        для самого низкого, так что первое показание после запуска тоже дает одно оповещение.
+        """
+        passed = [threshold for threshold in self.thresholds if current <= threshold]
+        level = min(passed) if passed else None
+        if level is None:
+            # Заряд снова выше верхнего порога - тревога снята
+            if alerted is not None:
+                return [("recovered", self.thresholds[0])], None
+            return [], None
+        if alerted is None or level < alerted:
+            return [("low", level)], level
+        # Тот же порог или заряд немного поднялся: повторный спуск до нижнего порога снова оповестит
+        return [], level
+
+    def poll(self):
+        """Снять показание, сохранить его и оповестить о пересеченных порогах"""
+        self.polls += 1
+        battery_data = self.read_battery()
+        percentage = battery_data.get("battery_percentage")
+        if percentage is None:
+            self.errors += 1
+            return battery_data
+
+        now = time.time()
+        with self._lock:
+            self._latest = battery_data
+            self._latest_at = now
+            self.history.append({
+                "time": int(now),
+                "battery_percentage": percentage,
+                "is_charging": battery_data.get("is_charging", False)
+            })
+
+        if self.state_path:
+            # Файл мог обновить воркер, опрашивавший до этого процесса
+            self.alerted = self._load_alerted()
+        events, alerted = self.crossings(self.alerted, percentage)
+        if alerted != self.alerted:
+            self.alerted = alerted
+            self._save_alerted()
+
+        for event, threshold in events:
+            for callback in self._listeners:
+                try:
+                    callback(event, threshold, battery_data)
+                except Exception as e:
+                    logger.exception("⚠️ Ошибка оповещения о батарее: %s", e)
+        return battery_data
+
+    def latest(self, max_age=None):
+        """Последнее показание и его возраст в секундах (None, если нет или слишком старое)"""
+        with self._lock:
+            if self._latest is None:
+                return None, None
+            age = time.time() - self._latest_at
+            if max_age is not None and age > max_age:
+                return None, age
+            return self._latest, age
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if not self.should_poll():
+                # Опрашивает другой процесс; проверяем, не пора ли его заменить
+                self._stop.wait(self.fast_interval)
+                continue
+            try:
+                battery_data = self.poll()
+            except Exception as e:
+                self.errors += 1
+                logger.warning("⚠️ Не удалось опросить батарею: %s", e)
+                battery_data = None
+            self._stop.wait(self.next_interval(battery_data))
+
+    def start(self):
+        """Запустить фоновый опрос (повторный вызов ничего не делает)"""
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._loop,
+                    name="battery-monitor",
+                    daemon=True
+                )
+                self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        """Последнее показание, история и счетчики опросов"""
+        battery_data, age = self.latest()
+        with self._lock:
+            history = list(self.history)
+        return {
+            "running": self._thread is not None and not self._stop.is_set(),
+            "battery_percentage": battery_data["battery_percentage"] if battery_data else None,
+            "is_charging": battery_data["is_charging"] if battery_data else None,
+            "age": round(age, 1) if age is not None else None,
+            "next_interval": self.next_interval(battery_data),
+            "thresholds": self.thresholds,
+            "alerted": self.alerted,
+            "polls": self.polls,
+            "errors": self.errors,
+            "history": history
+        }
@@ -0,0 +1,71 @@
+import time
+
+# Время в отчетах свойств ставит облако Tuya: сравнивать его с локальными часами нельзя,
+# поэтому подтверждение ищется относительно отчета, прочитанного до команды.
+
+
+def reported_times(properties):
+    """Время последнего отчета по каждому свойству: {code: time}"""
+    return {item.get("code"): item.get("time") or 0 for item in properties}
+
+
+def confirmed(properties, expected, baseline=None):
+    """Подтвердило ли устройство свойства expected ({code: значение})
+
+    baseline - время отчетов до команды: свойство должно отчитаться заново.
+    Без baseline (отчет до команды не прочитан) достаточно совпадения значений.
+    """
+    reported = {item.get("code"): item for item in properties}
+    for code, value in expected.items():
+        item = reported.get(code)
+        if item is None:
+            return False
+        if baseline is not None:
+            if (item.get("time") or 0) <= baseline.get(code, 0):
+                return False
+        elif item.get("value") != value:
+            return False
+    return True
+
+
+def wait_for_confirmation(read_reported, expected, baseline=None, timeout=8.0,
+                          first_delay=0.3, factor=1.6, max_delay=2.0):
+    """Опрашивать reported-свойства, пока устройство не подтвердит команду или не выйдет срок
+
+    read_reported() возвращает ответ Tuya со списком свойств в result.properties;
+    expected и baseline - как в confirmed().
+    Пауза между опросами растет от first_delay до max_delay: быстрые устройства
+    подтверждаются с первого-второго опроса, медленные не тратят лишние вызовы.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    delay = first_delay
+    polls = 0
+    properties = []
+
+    while True:
+        # Устройству нужно время на нажатие, поэтому сначала ждем
+        sleep_for = min(delay, deadline - time.monotonic())
+        if sleep_for <= 0:
+            break
+        time.sleep(sleep_for)
+
+        polls += 1
+        result = read_reported()
+        if result.get("success"):
+            properties = result.get("result", {}).get("properties", [])
+            if confirmed(properties, expected, baseline):
+                return {
+                    "confirmed": True,
+                    "polls": polls,
+                    "elapsed": round(time.monotonic() - started, 3),
+                    "properties": properties
+                }
+        delay = min(delay * factor, max_delay)
+
+    return {
+        "confirmed": False,
+        "polls": polls,
+        "elapsed": round(time.monotonic() - started, 3),
+        "properties": properties
+    }
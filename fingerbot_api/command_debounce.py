@@ -0,0 +1,84 @@
+import threading
+import time
+
+
+class _PendingCommand:
+    """Отправляемая команда, результат которой ждут повторные нажатия"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class CommandDebouncer:
+    """Подавление повторных команд (устройство + действие) в пределах окна"""
+
+    def __init__(self, window=3.0):
+        self.window = window
+        self._pending = {}
+        self._recent = {}
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.deduplicated = 0
+
+    def run(self, key, fn):
+        """Выполнить fn() или вернуть результат такой же недавней команды.
+
+        Возвращает (result, deduplicated).
+        """
+        if self.window <= 0:
+            return fn(), False
+
+        with self._lock:
+            now = time.monotonic()
+            recent = self._recent.get(key)
+            if recent is not None and now - recent[1] < self.window:
+                self.deduplicated += 1
+                return recent[0], True
+
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = _PendingCommand()
+                self._pending[key] = pending
+                self.sent += 1
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.result, True
+
+        try:
+            pending.result = fn()
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+                # Повторно используем только успешный результат - после ошибки гость может нажать снова
+                if pending.error is None and pending.result.get("success"):
+                    self._recent[key] = (pending.result, now)
+                self._prune(time.monotonic())
+            pending.event.set()
+
+        return pending.result, False
+
+    def _prune(self, now):
+        for key, (_, sent_at) in list(self._recent.items()):
+            if now - sent_at >= self.window:
+                del self._recent[key]
+
+    def stats(self):
+        """Статистика отправленных и подавленных команд"""
+        with self._lock:
+            return {
+                "window": self.window,
+                "sent": self.sent,
+                "deduplicated": self.deduplicated,
+                "pending": len(self._pending)
+            }
@@ -0,0 +1,126 @@
+import json
+from functools import lru_cache
+from signature import PreparedBody
+
+# Таблица команд FingerBot (desired-свойства shadow). Тела постоянных команд
+# сериализуются и хэшируются один раз при импорте, тела команд с параметрами -
+# при первом вызове с данными значениями (LRU-кэш). Используется в app.py и fingerbot.py.
+
+SHADOW_DURATION = 3600
+
+
+def shadow_payload(properties, duration=SHADOW_DURATION):
+    """Тело запроса /shadow/properties/desired для набора свойств"""
+    return {
+        "properties": json.dumps(properties),
+        "duration": duration,
+        "type": 1
+    }
+
+
+@lru_cache(maxsize=256)
+def _prepare(items, duration):
+    return PreparedBody(shadow_payload(dict(items), duration))
+
+
+def prepare_properties(properties, duration=SHADOW_DURATION):
+    """PreparedBody для свойств (повторные значения берутся из кэша)"""
+    return _prepare(tuple(properties.items()), duration)
+
+
+class Param:
+    """Параметр команды из query string: свойство, имя аргумента, значение по умолчанию, пределы"""
+
+    def __init__(self, code, arg, default, low, high):
+        self.code = code
+        self.arg = arg
+        self.default = default
+        self.low = low
+        self.high = high
+
+    def clamp(self, value):
+        return max(self.low, min(self.high, value))
+
+
+class Command:
+    """Команда устройства: маршрут, описание и свойства (постоянные и из параметров)"""
+
+    def __init__(self, route, action, description, properties, params=(), duration=SHADOW_DURATION):
+        self.route = route
+        self.action = action
+        self.description = description
+        self.properties = properties
+        self.params = tuple(params)
+        self.duration = duration
+        # Постоянная команда готова заранее
+        self.prepared = None if self.params else prepare_properties(properties, duration)
+
+    def build(self, args=None):
+        """Свойства и PreparedBody для значений параметров args (dict аргумент -> int)"""
+        if not self.params:
+            return self.properties, self.prepared
+        args = args or {}
+        properties = {}
+        for param in self.params:
+            value = args.get(param.arg)
+            properties[param.code] = param.clamp(param.default if value is None else value)
+        properties.update(self.properties)
+        return properties, prepare_properties(properties, self.duration)
+
+    def describe(self, properties):
+        return self.description.format(**properties)
+
+
+COMMANDS = {command.action: command for command in (
+    Command("/set_press", "press", "Lower arm completely (press)", {
+        "arm_down_percent": 100,
+        "arm_up_percent": 0,
+        "switch": True
+    }),
+    Command("/set_release", "release", "Raise arm completely (release)", {
+        "arm_down_percent": 0,
+        "arm_up_percent": 100,
+        "switch": True
+    }),
+    Command("/set_click", "click", "Press and release (click cycle)", {
+        "arm_down_percent": 100,
+        "arm_up_percent": 100,
+        "switch": True,
+        "mode": "click"
+    }),
+    Command("/quick_click", "quick_click", "Quick press and release (1s hold)", {
+        "arm_down_percent": 100,
+        "arm_up_percent": 100,
+        "click_sustain_time": 1,
+        "switch": True,
+        "mode": "click"
+    }),
+    Command("/long_press", "long_press", "Long press and release (10s hold)", {
+        "arm_down_percent": 100,
+        "arm_up_percent": 100,
+        "click_sustain_time": 10,
+        "switch": True,
+        "mode": "click"
+    }),
+    Command("/half_press", "half_press", "Set arm to 50% position", {
+        "arm_down_percent": 50,
+        "arm_up_percent": 50,
+        "switch": True
+    }),
+    Command(
+        "/set_custom_position", "custom_position",
+        "Set custom position: down={arm_down_percent}%, up={arm_up_percent}%, hold={click_sustain_time}s",
+        {"switch": True, "mode": "click"},
+        params=(
+            Param("arm_down_percent", "down", 50, 0, 100),
+            Param("arm_up_percent", "up", 50, 0, 100),
+            Param("click_sustain_time", "hold", 2, 0, 10)
+        )
+    ),
+    Command(
+        "/set_hold_time", "set_hold_time", "Set click hold time to {click_sustain_time} seconds",
+        {"switch": True},
+        params=(Param("click_sustain_time", "time", 2, 0, 10),)
+    ),
+    Command("/clear_commands", "clear_commands", "Clear all desired properties", {}, duration=1)
+)}
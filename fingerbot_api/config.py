@@ -10,6 +10,110 @@ CLIENT_SECRET = os.getenv("TUYA_CLIENT_SECRET")
 DEVICE_ID = os.getenv("TUYA_DEVICE_ID")
 TUYA_REGION = os.getenv("TUYA_REGION", "eu")
 
+# Адрес HTTP сервера API (app.py, async_app.py, gunicorn)
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "5001"))
+
+# Реестр устройств (SQLite): все FingerBot, которыми управляет API
+DEVICE_REGISTRY = os.getenv(
+    "DEVICE_REGISTRY",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "devices.db")
+)
+
+# Пакетный статус: устройств в одном запросе Tuya (не больше 20) и одновременных запросов
+BATCH_STATUS_CHUNK = min(20, int(os.getenv("BATCH_STATUS_CHUNK", "20")))
+BATCH_STATUS_CONCURRENCY = int(os.getenv("BATCH_STATUS_CONCURRENCY", "4"))
+
+# Пул HTTP соединений к Tuya Cloud
+TUYA_POOL_SIZE = int(os.getenv("TUYA_POOL_SIZE", "10"))
+TUYA_POOL_IDLE_TIMEOUT = float(os.getenv("TUYA_POOL_IDLE_TIMEOUT", "90"))
+TUYA_WARMUP = os.getenv("TUYA_WARMUP", "1") == "1"
+
+# За сколько секунд до истечения фоновый поток обновляет токен
+TUYA_TOKEN_RENEW_AHEAD = int(os.getenv("TUYA_TOKEN_RENEW_AHEAD", "600"))
+
+# Файл с токеном, общий для всех процессов API на хосте (пустая строка - отключить)
+TUYA_TOKEN_STORE = os.getenv(
+    "TUYA_TOKEN_STORE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tuya_token.json")
+)
+
+# Клиентские лимиты Tuya API: вызовов в секунду по видам, всплеск, суточный лимит (0 - нет)
+# и сколько секунд вызов может подождать свободного слота, прежде чем получить отказ
+TUYA_RATE_TOKEN = float(os.getenv("TUYA_RATE_TOKEN", "1"))
+TUYA_RATE_READ = float(os.getenv("TUYA_RATE_READ", "10"))
+TUYA_RATE_WRITE = float(os.getenv("TUYA_RATE_WRITE", "5"))
+TUYA_RATE_BURST = int(os.getenv("TUYA_RATE_BURST", "10"))
+TUYA_DAILY_LIMIT = int(os.getenv("TUYA_DAILY_LIMIT", "0"))
+TUYA_RATE_MAX_WAIT = float(os.getenv("TUYA_RATE_MAX_WAIT", "2"))
+
+# Таймауты Tuya API (секунды): установление соединения и ожидание ответа по видам операций
+TUYA_CONNECT_TIMEOUT = float(os.getenv("TUYA_CONNECT_TIMEOUT", "3"))
+TUYA_TOKEN_TIMEOUT = float(os.getenv("TUYA_TOKEN_TIMEOUT", "5"))
+TUYA_READ_TIMEOUT = float(os.getenv("TUYA_READ_TIMEOUT", "5"))
+TUYA_WRITE_TIMEOUT = float(os.getenv("TUYA_WRITE_TIMEOUT", "10"))
+
+# Повторы с экспоненциальной задержкой и circuit breaker
+TUYA_MAX_RETRIES = int(os.getenv("TUYA_MAX_RETRIES", "2"))
+TUYA_RETRY_BACKOFF = float(os.getenv("TUYA_RETRY_BACKOFF", "0.2"))
+TUYA_RETRY_BACKOFF_MAX = float(os.getenv("TUYA_RETRY_BACKOFF_MAX", "2"))
+TUYA_BREAKER_THRESHOLD = int(os.getenv("TUYA_BREAKER_THRESHOLD", "5"))
+TUYA_BREAKER_RESET = float(os.getenv("TUYA_BREAKER_RESET", "30"))
+
+# Кэш статуса устройства (секунды): свежие данные и окно отдачи устаревших
+STATUS_CACHE_TTL = float(os.getenv("STATUS_CACHE_TTL", "60"))
+STATUS_CACHE_STALE = float(os.getenv("STATUS_CACHE_STALE", "300"))
+
+# Окно (секунды), в котором повторный клик не отправляется на устройство (0 - отключить)
+CLICK_DEBOUNCE_WINDOW = float(os.getenv("CLICK_DEBOUNCE_WINDOW", "3"))
+
+# Подтверждение клика по reported-свойствам shadow: включено по умолчанию или нет,
+# сколько секунд ждать и паузы между опросами (растут от первой до максимальной)
+CLICK_CONFIRM = os.getenv("CLICK_CONFIRM", "0") == "1"
+CLICK_CONFIRM_TIMEOUT = float(os.getenv("CLICK_CONFIRM_TIMEOUT", "8"))
+CLICK_CONFIRM_FIRST_DELAY = float(os.getenv("CLICK_CONFIRM_FIRST_DELAY", "0.3"))
+CLICK_CONFIRM_MAX_DELAY = float(os.getenv("CLICK_CONFIRM_MAX_DELAY", "2"))
+
+# Очередь вызовов устройства: максимальная глубина и минимальный интервал между вызовами (секунды)
+DISPATCH_MAX_DEPTH = int(os.getenv("DISPATCH_MAX_DEPTH", "20"))
+DISPATCH_MIN_INTERVAL = float(os.getenv("DISPATCH_MIN_INTERVAL", "0.1"))
+
+# Фоновый мониторинг батареи: интервалы опроса (секунды) - при высоком заряде, у порогов
+# (заряд не выше верхнего порога + BATTERY_NEAR_MARGIN) и во время зарядки.
+# Показание не старше BATTERY_MAX_AGE отдается на запросы заряда без вызова Tuya
+BATTERY_MONITOR = os.getenv("BATTERY_MONITOR", "1") == "1"
+BATTERY_POLL_SLOW = float(os.getenv("BATTERY_POLL_SLOW", "1800"))
+BATTERY_POLL_FAST = float(os.getenv("BATTERY_POLL_FAST", "300"))
+BATTERY_POLL_CHARGING = float(os.getenv("BATTERY_POLL_CHARGING", "600"))
+BATTERY_NEAR_MARGIN = int(os.getenv("BATTERY_NEAR_MARGIN", "10"))
+BATTERY_MAX_AGE = float(os.getenv("BATTERY_MAX_AGE", "3600"))
+# Файл блокировки: при нескольких воркерах батарею опрашивает и оповещает только один
+BATTERY_MONITOR_LOCK = os.getenv(
+    "BATTERY_MONITOR_LOCK",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".battery_monitor.lock")
+)
+# Последний оповещенный порог заряда: перезапуск и смена опрашивающего воркера не повторяют оповещение
+BATTERY_MONITOR_STATE = os.getenv(
+    "BATTERY_MONITOR_STATE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".battery_monitor.json")
+)
+
+# Оповещения администраторов о пересечении порогов заряда (chat_id через запятую)
+BATTERY_ALERT_BOT_TOKEN = os.getenv("BATTERY_ALERT_BOT_TOKEN", os.getenv("TELEGRAM_BOT_TOKEN", ""))
+BATTERY_ALERT_CHAT_IDS = [
+    chat_id.strip() for chat_id in os.getenv("BATTERY_ALERT_CHAT_IDS", "").split(",") if chat_id.strip()
+]
+
+# Push-события Tuya Message Service вместо опроса статуса (нужен пакет cryptography).
+# TUYA_MQ_URL - сервер подписки (пусто - по региону), TUYA_MQ_ENV - event или event-test
+TUYA_MQ = os.getenv("TUYA_MQ", "0") == "1"
+TUYA_MQ_URL = os.getenv("TUYA_MQ_URL", "")
+TUYA_MQ_ENV = os.getenv("TUYA_MQ_ENV", "event")
+
+# Логирование: уровень (DEBUG - запросы Tuya с подписями и телами) и формат text или json
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
 # Проверка обязательных переменных
 required_vars = {
     "TUYA_CLIENT_ID": CLIENT_ID,
@@ -0,0 +1,322 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from tuya_client import call_tuya_api_v2, get_access_token, warm_up_connections, start_token_renewer
+from status_cache import StatusCache
+from command_debounce import CommandDebouncer
+from battery_monitor import BatteryMonitor
+from process_lock import LeaderLock
+from command_confirm import reported_times, wait_for_confirmation
+from device_state import DeviceStateStore
+from device_registry import DeviceRegistry
+from tuya_mq import MQ_URLS, WebSocketTransport, PushSubscriber
+from telegram_alerts import send_alert
+from dispatcher import DeviceDispatcher, QueueFull, PRIORITY_COMMAND, PRIORITY_READ
+from commands import COMMANDS
+from battery_info import (
+    BATTERY_LOW_THRESHOLD, BATTERY_CRITICAL_THRESHOLD, parse_battery_info, format_battery_message
+)
+from singleflight import SingleFlight
+import metrics
+from config import (
+    CLIENT_ID, CLIENT_SECRET, TUYA_REGION, TUYA_MQ, TUYA_MQ_URL, TUYA_MQ_ENV, DEVICE_REGISTRY,
+    DEVICE_ID, BATCH_STATUS_CHUNK, BATCH_STATUS_CONCURRENCY, TUYA_WARMUP, STATUS_CACHE_TTL, STATUS_CACHE_STALE, CLICK_DEBOUNCE_WINDOW,
+    DISPATCH_MAX_DEPTH, DISPATCH_MIN_INTERVAL,
+    CLICK_CONFIRM, CLICK_CONFIRM_TIMEOUT, CLICK_CONFIRM_FIRST_DELAY, CLICK_CONFIRM_MAX_DELAY,
+    BATTERY_MONITOR, BATTERY_POLL_SLOW, BATTERY_POLL_FAST, BATTERY_POLL_CHARGING,
+    BATTERY_NEAR_MARGIN, BATTERY_MAX_AGE, BATTERY_MONITOR_LOCK, BATTERY_MONITOR_STATE, BATTERY_ALERT_BOT_TOKEN, BATTERY_ALERT_CHAT_IDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Слой управления устройством: его используют Flask API (app.py)
+# и Telegram бот во встроенном режиме, без HTTP между ними
+
+# Реестр устройств; устройство из TUYA_DEVICE_ID есть в нем всегда
+registry = DeviceRegistry(DEVICE_REGISTRY)
+registry.ensure(DEVICE_ID, name="FingerBot")
+
+# Общий кэш статуса для /device_status, /battery_status и /check_battery
+status_cache = StatusCache(ttl=STATUS_CACHE_TTL, stale_ttl=STATUS_CACHE_STALE)
+
+# Повторные клики в пределах окна получают результат уже отправленной команды
+click_debouncer = CommandDebouncer(window=CLICK_DEBOUNCE_WINDOW)
+
+# Очередь вызовов устройства: команды выполняются раньше чтений статуса
+dispatcher = DeviceDispatcher(max_depth=DISPATCH_MAX_DEPTH, min_interval=DISPATCH_MIN_INTERVAL)
+
+# Одинаковые одновременные чтения объединяются до постановки в очередь: иначе очередь
+# выполнит их по одному и SingleFlight в call_tuya_api_v2 не успеет их объединить
+inflight_device_reads = SingleFlight()
+
+device_queue_rejected_total = metrics.registry.counter(
+    "device_queue_rejected_total", "Вызовы, отклоненные из-за переполнения очереди"
+)
+
+def dispatch(device_id, priority, fn):
+    """Поставить вызов в очередь устройства, учитывая отказы из-за переполнения"""
+    try:
+        return dispatcher.run(device_id, priority, fn)
+    except QueueFull:
+        device_queue_rejected_total.inc()
+        raise
+
+def call_device_api(endpoint, method="GET", payload=None, device_id=DEVICE_ID):
+    """Вызов Tuya API устройства через очередь (GET - чтение, остальное - команда)"""
+    if method == "GET":
+        return inflight_device_reads.do(
+            (device_id, endpoint),
+            lambda: dispatch(device_id, PRIORITY_READ, lambda: call_tuya_api_v2(endpoint, method, payload))
+        )
+    return dispatch(
+        device_id,
+        PRIORITY_COMMAND,
+        lambda: call_tuya_api_v2(endpoint, method, payload)
+    )
+
+# Состояние из push-событий Tuya: при активной подписке статус читается из памяти
+device_state = DeviceStateStore()
+push_subscriber = None
+
+def start_push_subscriber(transport=None):
+    """Подписаться на push-события Tuya (transport - для тестов, по умолчанию WebSocket)"""
+    global push_subscriber
+    if push_subscriber is None:
+        if transport is None:
+            transport = WebSocketTransport(
+                TUYA_MQ_URL or MQ_URLS.get(TUYA_REGION, MQ_URLS["eu"]),
+                CLIENT_ID,
+                CLIENT_SECRET,
+                env=TUYA_MQ_ENV
+            )
+        push_subscriber = PushSubscriber(transport, CLIENT_SECRET, device_state)
+        push_subscriber.start()
+    return push_subscriber
+
+def read_pushed_status(device_id):
+    """Статус из push-состояния или None, если подписки или полного снимка нет"""
+    if push_subscriber is None or not push_subscriber.connected:
+        return None
+    status = device_state.get(device_id)
+    if status is None:
+        return None
+    return {"success": True, "result": status, "source": "push"}
+
+def remember_status(device_id, result):
+    """Снимок из опроса - основа для push-состояния"""
+    if push_subscriber is not None and push_subscriber.connected and result.get("success"):
+        device_state.seed(device_id, result.get("result", []))
+    return result
+
+def get_device_status(device_id=DEVICE_ID):
+    """Получить статус устройства (из push-состояния или через кэш)"""
+    pushed = read_pushed_status(device_id)
+    if pushed is not None:
+        return pushed
+    return remember_status(device_id, status_cache.get(
+        device_id,
+        lambda: call_device_api(f"/v1.0/devices/{device_id}/status", device_id=device_id)
+    ))
+
+# Пакетные запросы статуса выполняются параллельно через общий пул соединений
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_STATUS_CONCURRENCY, thread_name_prefix="batch-status")
+
+def _fetch_status_chunk(device_ids):
+    """Статус до 20 устройств одним запросом Tuya"""
+    # Поколения до запроса: ответ не должен перезаписать кэш, сброшенный командой
+    generations = {device_id: status_cache.generation(device_id) for device_id in device_ids}
+    result = call_tuya_api_v2(
+        "/v1.0/iot-03/devices/status",
+        params={"device_ids": ",".join(device_ids)}
+    )
+    if not result.get("success"):
+        return {device_id: result for device_id in device_ids}
+    
+    statuses = {}
+    for item in result.get("result", []):
+        statuses[item["id"]] = remember_status(item["id"], {"success": True, "result": item.get("status", [])})
+        status_cache.set(item["id"], statuses[item["id"]], generations.get(item["id"]))
+    for device_id in device_ids:
+        statuses.setdefault(device_id, {"success": False, "error": "Device status not returned"})
+    return statuses
+
+def get_devices_status(device_ids):
+    """Статус многих устройств: из push-состояния и кэша, остальное - пакетами по 20"""
+    statuses = {}
+    missing = []
+    for device_id in dict.fromkeys(device_ids):
+        cached = read_pushed_status(device_id) or status_cache.peek(device_id)
+        if cached is not None:
+            statuses[device_id] = cached
+        else:
+            missing.append(device_id)
+    
+    chunks = [missing[i:i + BATCH_STATUS_CHUNK] for i in range(0, len(missing), BATCH_STATUS_CHUNK)]
+    for chunk_statuses in batch_executor.map(_fetch_status_chunk, chunks):
+        statuses.update(chunk_statuses)
+    
+    return {
+        "success": all(status.get("success") for status in statuses.values()),
+        "devices": statuses,
+        "cached": len(statuses) - len(missing),
+        "requests": len(chunks)
+    }
+
+def get_battery_info(device_id=DEVICE_ID):
+    """Получить информацию о батарее устройства"""
+    return parse_battery_info(get_device_status(device_id))
+
+def read_battery_fresh():
+    """Свежее показание батареи (push-состояние или Tuya минуя кэш), статус заодно обновляет кэш"""
+    result = read_pushed_status(DEVICE_ID)
+    if result is None:
+        result = remember_status(DEVICE_ID, call_device_api(f"/v1.0/devices/{DEVICE_ID}/status"))
+        status_cache.set(DEVICE_ID, result)
+    return parse_battery_info(result)
+
+# Фоновый опрос батареи: запросы заряда отвечаются из памяти, админы получают оповещения
+battery_monitor = BatteryMonitor(
+    read_battery_fresh,
+    thresholds=(BATTERY_LOW_THRESHOLD, BATTERY_CRITICAL_THRESHOLD),
+    slow_interval=BATTERY_POLL_SLOW,
+    fast_interval=BATTERY_POLL_FAST,
+    charging_interval=BATTERY_POLL_CHARGING,
+    near_margin=BATTERY_NEAR_MARGIN,
+    should_poll=LeaderLock(BATTERY_MONITOR_LOCK).acquire,
+    state_path=BATTERY_MONITOR_STATE
+)
+
+def battery_alert(event, threshold, battery_data):
+    """Оповестить администраторов о пересечении порога заряда"""
+    if event == "low":
+        icon = "🔴" if threshold <= BATTERY_CRITICAL_THRESHOLD else "⚠️"
+        text = f"{icon} *FingerBot: заряд {battery_data['battery_level']}* (порог {threshold}%)\n\nЗарядите устройство"
+    else:
+        text = f"✅ *FingerBot: заряд восстановлен* - {battery_data['battery_level']}"
+    logger.info(
+        "🔋 Оповещение о батарее: %s %s%% (%s)", event, threshold, battery_data["battery_level"],
+        extra={"event": event, "threshold": threshold}
+    )
+    send_alert(BATTERY_ALERT_BOT_TOKEN, BATTERY_ALERT_CHAT_IDS, text)
+
+battery_monitor.add_listener(battery_alert)
+
+# Метрики слоя устройств: попадания в кэш, очереди, заряд
+metrics.registry.gauge(
+    "status_cache_hit_ratio", "Доля запросов статуса, отданных из кэша",
+    lambda: status_cache.stats()["hit_ratio"]
+)
+metrics.registry.gauge(
+    "status_cache_requests", "Запросы статуса по результату в кэше",
+    lambda: {key: value for key, value in status_cache.stats().items() if key in ("hits", "stale_hits", "misses")},
+    label="result"
+)
+metrics.registry.gauge(
+    "device_queue_depth", "Ожидающие вызовы в очередях устройств (всего)",
+    lambda: sum(dispatcher.stats()["queues"].values())
+)
+metrics.registry.gauge(
+    "battery_percentage", "Последнее показание заряда из фонового мониторинга",
+    lambda: (battery_monitor.latest()[0] or {}).get("battery_percentage")
+)
+
+def start_battery_monitor():
+    """Запустить фоновый опрос батареи, если он включен"""
+    if BATTERY_MONITOR:
+        return battery_monitor.start()
+    return None
+
+def check_battery(device_id=DEVICE_ID):
+    """Проверить заряд - ответ для Telegram бота"""
+    battery_data = None
+    if device_id == DEVICE_ID:
+        # Последнее показание монитора отдается сразу, без вызова Tuya
+        battery_data, _ = battery_monitor.latest(max_age=BATTERY_MAX_AGE)
+    if battery_data is None:
+        battery_data = get_battery_info(device_id)
+    return {
+        "success": True,
+        "message": format_battery_message(battery_data),
+        "battery_data": battery_data
+    }
+
+def read_reported(codes, device_id=DEVICE_ID):
+    """Reported-свойства codes устройства (ответ Tuya)"""
+    return call_device_api(
+        f"/v2.0/cloud/thing/{device_id}/shadow/properties?codes={','.join(codes)}",
+        device_id=device_id
+    )
+
+def reported_baseline(codes, device_id=DEVICE_ID):
+    """Время отчетов codes до команды (None - прочитать не удалось)"""
+    result = read_reported(codes, device_id)
+    if not result.get("success"):
+        return None
+    return reported_times(result.get("result", {}).get("properties", []))
+
+def confirm_command(expected, baseline, device_id=DEVICE_ID):
+    """Дождаться, пока устройство отчитается о свойствах expected после команды"""
+    return wait_for_confirmation(
+        lambda: read_reported(list(expected), device_id),
+        expected,
+        baseline,
+        timeout=CLICK_CONFIRM_TIMEOUT,
+        first_delay=CLICK_CONFIRM_FIRST_DELAY,
+        max_delay=CLICK_CONFIRM_MAX_DELAY
+    )
+
+# Команда быстрого клика: тело и его хэш готовы заранее
+QUICK_CLICK_PAYLOAD = COMMANDS["quick_click"].prepared
+
+click_commands_total = metrics.registry.counter(
+    "click_commands_total", "Клики: отправленные и подавленные debounce", ("result",)
+)
+
+def quick_click(confirm=None, device_id=DEVICE_ID):
+    """Быстрый клик - основная функция
+
+    confirm: дождаться подтверждения от устройства (по умолчанию - CLICK_CONFIRM).
+    """
+    if confirm is None:
+        confirm = CLICK_CONFIRM
+    
+    def send():
+        # Отчет до команды: подтверждением считается только более новый отчет устройства
+        baseline = reported_baseline(["switch"], device_id) if confirm else None
+        result = call_device_api(
+            f"/v2.0/cloud/thing/{device_id}/shadow/properties/desired", 
+            "POST", 
+            QUICK_CLICK_PAYLOAD,
+            device_id=device_id
+        )
+        if confirm and result.get("success"):
+            # Повторные нажатия в окне debounce получат это же подтверждение
+            result = dict(result, confirmation=confirm_command({"switch": True}, baseline, device_id))
+        return result
+    
+    result, deduplicated = click_debouncer.run((device_id, "quick_click"), send)
+    click_commands_total.inc(result="deduplicated" if deduplicated else "sent")
+    
+    # Команда меняет состояние устройства - закэшированный статус больше не актуален
+    if result.get("success") and not deduplicated:
+        status_cache.invalidate(device_id)
+    
+    confirmation = result.get("confirmation")
+    return {
+        "action": "quick_click",
+        "device_id": device_id,
+        "success": result.get("success", False),
+        "deduplicated": deduplicated,
+        "confirmed": confirmation["confirmed"] if confirmation else None,
+        "result": result
+    }
+
+def warm_up(push=None):
+    """Подготовка к первому клику: соединение с Tuya Cloud, токен и его фоновое обновление"""
+    if TUYA_WARMUP:
+        warm_up_connections()
+    token = get_access_token()
+    start_token_renewer()
+    if TUYA_MQ if push is None else push:
+        start_push_subscriber()
+    start_battery_monitor()
+    return token
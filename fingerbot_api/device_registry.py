@@ -0,0 +1,141 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+
+
+class DeviceRegistry:
+    """Реестр устройств в SQLite: метаданные каждого FingerBot (квартира, название ...)
+
+    Чтения идут из словаря в памяти, SQLite нужен для хранения и выборок по квартире.
+    Изменения из других процессов (CLI, другие воркеры) видны по PRAGMA data_version:
+    при его смене словарь перечитывается.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS devices ("
+                " device_id TEXT PRIMARY KEY,"
+                " name TEXT NOT NULL DEFAULT '',"
+                " apartment TEXT NOT NULL DEFAULT '',"
+                " metadata TEXT NOT NULL DEFAULT '{}',"
+                " created_at INTEGER NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS devices_apartment ON devices (apartment)")
+        self._cache = {}
+        self._version = None
+        self._refresh()
+
+    @staticmethod
+    def _row_to_device(row):
+        return {
+            "device_id": row["device_id"],
+            "name": row["name"],
+            "apartment": row["apartment"],
+            "metadata": json.loads(row["metadata"]),
+            "created_at": row["created_at"]
+        }
+
+    def _refresh(self):
+        """Перечитать словарь, если базу изменило другое соединение"""
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._version:
+                return
+            rows = self._conn.execute("SELECT * FROM devices").fetchall()
+            self._cache = {row["device_id"]: self._row_to_device(row) for row in rows}
+            self._version = version
+
+    def add(self, device_id, name="", apartment="", metadata=None):
+        """Добавить устройство или обновить его метаданные"""
+        device = {
+            "device_id": device_id,
+            "name": name,
+            "apartment": apartment,
+            "metadata": metadata or {},
+            "created_at": int(time.time())
+        }
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO devices (device_id, name, apartment, metadata, created_at)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(device_id) DO UPDATE SET"
+                " name = excluded.name, apartment = excluded.apartment, metadata = excluded.metadata",
+                (device_id, name, apartment, json.dumps(device["metadata"]), device["created_at"])
+            )
+            if device_id in self._cache:
+                device["created_at"] = self._cache[device_id]["created_at"]
+            self._cache[device_id] = device
+        return device
+
+    def ensure(self, device_id, **fields):
+        """Добавить устройство, только если его еще нет"""
+        return self.get(device_id) or self.add(device_id, **fields)
+
+    def remove(self, device_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM devices WHERE device_id = ?", (device_id,))
+            return self._cache.pop(device_id, None) is not None
+
+    def get(self, device_id):
+        """Устройство по id или None"""
+        self._refresh()
+        return self._cache.get(device_id)
+
+    def __contains__(self, device_id):
+        self._refresh()
+        return device_id in self._cache
+
+    def __len__(self):
+        self._refresh()
+        return len(self._cache)
+
+    def list(self, apartment=None):
+        """Все устройства или устройства одной квартиры"""
+        if apartment is None:
+            self._refresh()
+            return sorted(self._cache.values(), key=lambda device: device["device_id"])
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM devices WHERE apartment = ? ORDER BY device_id", (apartment,)
+            ).fetchall()
+        return [self._row_to_device(row) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Реестр устройств FingerBot")
+    parser.add_argument("--db", default=None, help="Файл реестра (по умолчанию DEVICE_REGISTRY из config)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Добавить устройство")
+    add.add_argument("device_id")
+    add.add_argument("--name", default="")
+    add.add_argument("--apartment", default="")
+    add.add_argument("--metadata", default="{}", help="JSON с дополнительными полями")
+    remove = commands.add_parser("remove", help="Удалить устройство")
+    remove.add_argument("device_id")
+    commands.add_parser("list", help="Список устройств")
+    args = parser.parse_args()
+
+    if args.db is None:
+        from config import DEVICE_REGISTRY
+        args.db = DEVICE_REGISTRY
+    registry = DeviceRegistry(args.db)
+
+    if args.command == "add":
+        device = registry.add(args.device_id, args.name, args.apartment, json.loads(args.metadata))
+        print(f"✅ Устройство добавлено: {device['device_id']}")
+    elif args.command == "remove":
+        print("✅ Устройство удалено" if registry.remove(args.device_id) else "❓ Устройство не найдено")
+    else:
+        for device in registry.list():
+            print(f"{device['device_id']}\t{device['apartment']}\t{device['name']}")
+
+
+if __name__ == "__main__":
+    main()
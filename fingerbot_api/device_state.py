@@ -0,0 +1,73 @@
+import threading
+import time
+
+
+class DeviceStateStore:
+    """Состояние устройств из push-событий Tuya: последнее значение каждого свойства в памяти"""
+
+    def __init__(self):
+        self._devices = {}
+        self._snapshots = set()
+        self._updated_at = {}
+        self._lock = threading.Lock()
+        self.events = 0
+        self.stale_events = 0
+
+    def apply(self, device_id, status, t=0):
+        """Применить свойства [{"code", "value", "t"}]; значения старше уже известных отбрасываются"""
+        with self._lock:
+            device = self._devices.setdefault(device_id, {})
+            for item in status:
+                item_t = item.get("t") or t
+                current = device.get(item["code"])
+                if current is not None and current[1] > item_t:
+                    self.stale_events += 1
+                    continue
+                device[item["code"]] = (item["value"], item_t)
+            self._updated_at[device_id] = time.time()
+            self.events += 1
+
+    def seed(self, device_id, status):
+        """Полный снимок из опроса /status: основа, поверх которой применяются события"""
+        with self._lock:
+            device = self._devices.setdefault(device_id, {})
+            for item in status:
+                # Опрос не знает времени значений - не перетираем уже пришедшие события
+                device.setdefault(item["code"], (item["value"], 0))
+            self._snapshots.add(device_id)
+            self._updated_at.setdefault(device_id, time.time())
+
+    def get(self, device_id):
+        """Статус в формате ответа /status или None, если полного снимка еще нет"""
+        with self._lock:
+            if device_id not in self._snapshots:
+                return None
+            return [
+                {"code": code, "value": value}
+                for code, (value, _) in self._devices[device_id].items()
+            ]
+
+    def forget(self, device_id=None):
+        """Сбросить состояние (например, после потери подписки события могли пропасть)"""
+        with self._lock:
+            if device_id is None:
+                self._devices.clear()
+                self._snapshots.clear()
+                self._updated_at.clear()
+            else:
+                self._devices.pop(device_id, None)
+                self._snapshots.discard(device_id)
+                self._updated_at.pop(device_id, None)
+
+    def stats(self):
+        """Число устройств и событий, время последнего обновления"""
+        with self._lock:
+            return {
+                "devices": len(self._devices),
+                "snapshots": len(self._snapshots),
+                "events": self.events,
+                "stale_events": self.stale_events,
+                "updated_at": {
+                    device_id: int(updated_at) for device_id, updated_at in self._updated_at.items()
+                }
+            }
@@ -0,0 +1,112 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Приоритеты: чем меньше число, тем раньше выполняется
+PRIORITY_COMMAND = 0   # quick_click, long_press, set_click ...
+PRIORITY_READ = 10     # device_status, device_info, device_functions ...
+
+
+class QueueFull(Exception):
+    """Очередь команд устройства переполнена"""
+
+    def __init__(self, device_id, depth):
+        super().__init__(f"Device queue is full: {device_id} ({depth} pending)")
+        self.device_id = device_id
+        self.depth = depth
+
+
+class _DeviceQueue:
+    def __init__(self):
+        self.items = queue.PriorityQueue()
+        self.worker = None
+        self.last_dispatch = 0.0
+
+
+class DeviceDispatcher:
+    """Очередь вызовов Tuya на каждое устройство: команды обгоняют чтения"""
+
+    def __init__(self, max_depth=20, min_interval=0.1, idle_timeout=60):
+        self.max_depth = max_depth
+        self.min_interval = min_interval
+        self.idle_timeout = idle_timeout
+        self._queues = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self.rejected = 0
+
+    def submit(self, device_id, priority, fn):
+        """Поставить вызов в очередь устройства, вернуть Future с результатом"""
+        future = Future()
+        with self._lock:
+            device_queue = self._queues.get(device_id)
+            if device_queue is None:
+                device_queue = self._queues[device_id] = _DeviceQueue()
+
+            depth = device_queue.items.qsize()
+            if depth >= self.max_depth:
+                self.rejected += 1
+                raise QueueFull(device_id, depth)
+
+            # seq сохраняет порядок FIFO внутри одного приоритета
+            device_queue.items.put((priority, next(self._seq), future, fn))
+            if device_queue.worker is None:
+                device_queue.worker = threading.Thread(
+                    target=self._worker_loop,
+                    args=(device_id, device_queue),
+                    name=f"dispatch-{device_id}",
+                    daemon=True
+                )
+                device_queue.worker.start()
+        return future
+
+    def run(self, device_id, priority, fn, timeout=None):
+        """Выполнить вызов через очередь устройства и дождаться результата"""
+        return self.submit(device_id, priority, fn).result(timeout)
+
+    def _worker_loop(self, device_id, device_queue):
+        while True:
+            try:
+                _, _, future, fn = device_queue.items.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    # Новые вызовы ставятся под той же блокировкой, так что очередь точно пуста
+                    if device_queue.items.empty():
+                        device_queue.worker = None
+                        del self._queues[device_id]
+                        return
+                continue
+
+            # Не чаще одного вызова в min_interval на устройство
+            wait = device_queue.last_dispatch + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            device_queue.last_dispatch = time.monotonic()
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+
+    def depth(self, device_id):
+        """Количество ожидающих вызовов устройства"""
+        with self._lock:
+            device_queue = self._queues.get(device_id)
+            return device_queue.items.qsize() if device_queue else 0
+
+    def stats(self):
+        """Глубина очередей по устройствам"""
+        with self._lock:
+            return {
+                "max_depth": self.max_depth,
+                "min_interval": self.min_interval,
+                "rejected": self.rejected,
+                "queues": {
+                    device_id: device_queue.items.qsize()
+                    for device_id, device_queue in self._queues.items()
+                }
+            }
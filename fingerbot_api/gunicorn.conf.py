@@ -0,0 +1,42 @@
+# Настройки gunicorn для FingerBot API:
+#   cd fingerbot_api && gunicorn -c gunicorn.conf.py wsgi:app
+# Плавный перезапуск без потери запросов: kill -HUP $(cat /tmp/fingerbot-api.pid)
+import os
+
+# Воркеры - процессы, threads - потоки в каждом (вызовы Tuya в основном ждут сеть)
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '5001')}"
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_class = "gthread"
+
+# Keep-alive соединения с клиентами (бот держит общую сессию к API)
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "30"))
+
+# Клик с подтверждением ждет устройство до CLICK_CONFIRM_TIMEOUT, берем с запасом
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+
+# Воркеры перезапускаются по очереди после N запросов (0 - никогда)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+pidfile = os.getenv("GUNICORN_PIDFILE", "/tmp/fingerbot-api.pid")
+accesslog = os.getenv("GUNICORN_ACCESSLOG") or None
+errorlog = "-"
+
+# Приложение загружается в каждом воркере отдельно: фоновые потоки и пулы соединений
+# не переживают fork, поэтому создаются уже в воркере
+preload_app = False
+
+
+def post_worker_init(worker):
+    """Прогрев воркера до первого запроса: соединение с Tuya, токен, фоновые задачи"""
+    import device_control
+    from config import TUYA_MQ
+
+    push = TUYA_MQ and workers == 1
+    if TUYA_MQ and not push:
+        # Подписка Failover доставляет события только одному воркеру, у остальных состояние отстанет
+        worker.log.warning("TUYA_MQ=1 работает только с GUNICORN_WORKERS=1, push-подписка отключена")
+    # Токен берется из общего файла (TUYA_TOKEN_STORE), батарею опрашивает один воркер
+    device_control.warm_up(push=push)
@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# Пул keep-alive сессий: одна requests.Session на базовый URL (регион).
+# Повторное использование соединений избавляет каждый вызов от TCP + TLS рукопожатия.
+
+logger = logging.getLogger(__name__)
+
+# Настройки пула (переопределяются через configure)
+pool_size = 10
+idle_timeout = 90.0
+
+_sessions = {}
+_last_used = {}
+_lock = threading.Lock()
+_reaper_thread = None
+
+
+def configure(size=None, idle=None):
+    """Задать размер пула и время жизни простаивающих соединений"""
+    global pool_size, idle_timeout
+    if size is not None:
+        pool_size = max(1, int(size))
+    if idle is not None:
+        idle_timeout = max(1.0, float(idle))
+
+
+def _create_session():
+    """Создать сессию с пулом соединений нужного размера"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        max_retries=0
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(base_url):
+    """Получить keep-alive сессию для базового URL региона"""
+    with _lock:
+        session = _sessions.get(base_url)
+        if session is None:
+            session = _create_session()
+            _sessions[base_url] = session
+        _last_used[base_url] = time.monotonic()
+        return session
+
+
+def warm_up(base_url, timeout=5):
+    """Заранее установить TCP + TLS соединение с сервером региона"""
+    session = get_session(base_url)
+    try:
+        # Код ответа не важен - важно, что соединение осталось в пуле
+        session.head(base_url, timeout=timeout)
+        return True
+    except requests.exceptions.RequestException as e:
+        logger.warning("⚠️ Не удалось прогреть соединение с %s: %s", base_url, e)
+        return False
+
+
+def reap_idle(now=None):
+    """Закрыть сессии, простаивающие дольше idle_timeout"""
+    now = time.monotonic() if now is None else now
+    reaped = []
+    with _lock:
+        for base_url, last_used in list(_last_used.items()):
+            if now - last_used >= idle_timeout:
+                reaped.append(_sessions.pop(base_url))
+                del _last_used[base_url]
+    for session in reaped:
+        session.close()
+    return len(reaped)
+
+
+def _reaper_loop(interval):
+    while True:
+        time.sleep(interval)
+        reap_idle()
+
+
+def start_reaper(interval=None):
+    """Запустить фоновую очистку простаивающих соединений"""
+    global _reaper_thread
+    with _lock:
+        if _reaper_thread is not None:
+            return _reaper_thread
+        interval = interval or max(1.0, idle_timeout / 2)
+        _reaper_thread = threading.Thread(
+            target=_reaper_loop,
+            args=(interval,),
+            name="http-pool-reaper",
+            daemon=True
+        )
+        _reaper_thread.start()
+        return _reaper_thread
+
+
+def close_all():
+    """Закрыть все сессии пула"""
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+        _last_used.clear()
+    for session in sessions:
+        session.close()
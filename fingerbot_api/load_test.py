@@ -0,0 +1,74 @@
+"""Нагрузочный тест FingerBot API: запросы/сек и перцентили задержки.
+
+python load_test.py --url http://127.0.0.1:5001/quick_click --requests 500 --concurrency 50
+
+Работает с любым вариантом сервера (app.py, gunicorn + wsgi.py, async_app.py).
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+import aiohttp
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def run(url, total, concurrency, timeout):
+    latencies = []
+    statuses = Counter()
+    remaining = iter(range(total))
+
+    async def worker(session):
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    statuses[response.status] += 1
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        await asyncio.gather(*[worker(session) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        "url": url,
+        "requests": len(ms),
+        "concurrency": concurrency,
+        "requests_per_second": round(len(ms) / elapsed, 1),
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "latency_ms": {
+            "mean": round(sum(ms) / len(ms), 2),
+            "p50": round(percentile(ms, 50), 2),
+            "p95": round(percentile(ms, 95), 2),
+            "p99": round(percentile(ms, 99), 2),
+            "max": round(max(ms), 2)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест FingerBot API")
+    parser.add_argument("--url", default="http://127.0.0.1:5001/quick_click")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.url, args.requests, args.concurrency, args.timeout))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
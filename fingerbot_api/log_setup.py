@@ -0,0 +1,64 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Логирование без блокировки обработчиков запросов: записи кладутся в очередь,
+# форматирование и запись в stderr выполняет отдельный поток QueueListener.
+# Модуль не зависит от config.py - его используют и API, и Telegram бот.
+
+_listener = None
+
+# Стандартные поля LogRecord - все остальное пришло через extra=
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class _LazyQueueHandler(QueueHandler):
+    """QueueHandler без форматирования в потоке вызова: сообщение собирает QueueListener"""
+
+    def prepare(self, record):
+        # Очередь в пределах процесса - запись передается как есть, без копирования
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON: время, уровень, логгер, сообщение и поля из extra"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level="INFO", fmt="text"):
+    """Настроить корневой логгер: очередь + фоновая запись (повторный вызов ничего не делает)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers[:] = [_LazyQueueHandler(log_queue)]
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    # Дописать оставшиеся в очереди записи при завершении процесса
+    atexit.register(_listener.stop)
@@ -0,0 +1,34 @@
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессная блокировка недоступна
+    fcntl = None
+
+
+class LeaderLock:
+    """Один процесс хоста среди нескольких (например, воркеров gunicorn) держит блокировку, пока жив"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """Попробовать стать лидером, не дожидаясь; True - блокировка у этого процесса"""
+        if self._file is not None or fcntl is None:
+            return True
+        f = open(self.path, "a")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        # Файл остается открытым: блокировка снимается вместе с завершением процесса
+        f.write(f"{os.getpid()}\n")
+        f.flush()
+        self._file = f
+        return True
+
+    @property
+    def held(self):
+        return self._file is not None or fcntl is None
@@ -0,0 +1,136 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Token bucket: rate вызовов в секунду с допустимым всплеском capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, timeout=0.0):
+        """Зарезервировать токен: сколько секунд подождать до вызова (None - лимит исчерпан)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+
+            wait = (1 - self._tokens) / self.rate
+            if wait > timeout:
+                self.throttled += 1
+                return None
+            # Резервируем токен заранее: ожидающие вызовы расходятся равномерно по времени
+            self._tokens -= 1
+            return wait
+
+    def refund(self):
+        """Вернуть зарезервированный токен (вызов так и не состоялся)"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    def acquire(self, timeout=0.0):
+        """Взять токен, подождав не дольше timeout секунд. False - лимит исчерпан"""
+        wait = self.reserve(timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def remaining(self):
+        """Доступный сейчас запас вызовов"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0, int(self._tokens))
+
+
+class DailyQuota:
+    """Суточный лимит вызовов (сбрасывается в полночь UTC)"""
+
+    def __init__(self, limit):
+        self.limit = int(limit)
+        self._day = None
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def _roll(self):
+        day = time.gmtime().tm_yday
+        if day != self._day:
+            self._day = day
+            self._used = 0
+
+    def acquire(self):
+        """Учесть вызов. False - суточный лимит исчерпан (limit <= 0 - без лимита)"""
+        with self._lock:
+            self._roll()
+            if 0 < self.limit <= self._used:
+                return False
+            self._used += 1
+            return True
+
+    def remaining(self):
+        """Сколько вызовов осталось на сегодня (None - без лимита)"""
+        with self._lock:
+            self._roll()
+            return max(0, self.limit - self._used) if self.limit > 0 else None
+
+
+class RateLimiter:
+    """Набор лимитов Tuya: отдельные bucket для токена, чтений и записей плюс суточная квота"""
+
+    def __init__(self, buckets, daily_limit=0, max_wait=2.0):
+        self.buckets = buckets
+        self.daily = DailyQuota(daily_limit)
+        self.max_wait = max_wait
+
+    def reserve(self, kind):
+        """Зарезервировать вызов вида kind ("token", "read", "write").
+
+        Возвращает задержку в секундах перед вызовом или None, если лимит исчерпан.
+        Подходит для asyncio: ждать можно через asyncio.sleep.
+        """
+        bucket = self.buckets[kind]
+        wait = bucket.reserve(self.max_wait)
+        if wait is None:
+            return None
+        if not self.daily.acquire():
+            # Вызова не будет - токен не должен пропадать из bucket
+            bucket.refund()
+            return None
+        return wait
+
+    def acquire(self, kind):
+        """Дождаться разрешения на вызов вида kind. False - лимит исчерпан"""
+        wait = self.reserve(kind)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def status(self):
+        """Оставшийся бюджет по каждому лимиту"""
+        return {
+            "buckets": {
+                kind: {
+                    "rate_per_second": bucket.rate,
+                    "burst": bucket.capacity,
+                    "remaining": bucket.remaining(),
+                    "throttled": bucket.throttled
+                }
+                for kind, bucket in self.buckets.items()
+            },
+            "daily_limit": self.daily.limit or None,
+            "daily_remaining": self.daily.remaining(),
+            "max_wait": self.max_wait
+        }
@@ -0,0 +1,88 @@
+import random
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Circuit breaker разомкнут: облако недоступно, вызов не выполняется"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Circuit open, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Circuit breaker: после серии сбоев вызовы сразу отклоняются до reset_timeout"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Можно ли выполнить вызов. В полуоткрытом состоянии пропускается одна проба"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self):
+        """Вызов дошел до облака и получил ответ"""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def release(self):
+        """Снять пробу полуоткрытого состояния без учета результата (вызов отменен)"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        """Таймаут, ошибка соединения или 5xx"""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def retry_after(self):
+        """Через сколько секунд breaker пропустит пробный вызов"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def status(self):
+        """Текущее состояние breaker"""
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "retry_after": round(self.retry_after(), 1)
+        }
+
+
+def backoff_delay(attempt, base=0.2, cap=2.0):
+    """Экспоненциальная задержка с полным джиттером перед повтором номер attempt (с 1)"""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
@@ -0,0 +1,69 @@
+"""Микробенчмарк подписи запросов Tuya: подписей в секунду.
+
+python sign_benchmark.py --count 100000
+
+Сравнивает прежнюю схему (json.dumps тела и новый HMAC на каждую подпись) с Signer
+(тело сериализовано один раз, HMAC копируется из заранее подготовленного ключа).
+Учетные данные не нужны - используются тестовые.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import time
+import uuid
+from commands import COMMANDS
+from signature import Signer, serialize_body
+
+CLIENT_ID = "benchclientid0000000"
+CLIENT_SECRET = "benchsecret00000000000000000000a"
+ACCESS_TOKEN = "benchaccesstoken000000000000000"
+URL = "/v2.0/cloud/thing/benchdevice00000/shadow/properties/desired"
+
+
+def sign_legacy(method, url, payload, access_token):
+    """Прежний generate_signature: повторная сериализация тела и hmac.new на каждый вызов"""
+    t = str(int(time.time() * 1000))
+    nonce = str(uuid.uuid4())
+    content_sha256 = hashlib.sha256(json.dumps(payload).encode("utf-8")).hexdigest()
+    string_to_sign = "\n".join([method.upper(), content_sha256, "", url])
+    str_for_hmac = CLIENT_ID + access_token + t + nonce + string_to_sign
+    return hmac.new(
+        CLIENT_SECRET.encode("utf-8"),
+        str_for_hmac.encode("utf-8"),
+        hashlib.sha256
+    ).hexdigest().upper(), t, nonce
+
+
+def rate(fn, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарк подписи запросов Tuya")
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    prepared = COMMANDS["quick_click"].prepared
+    payload = prepared.payload
+    signer = Signer(CLIENT_ID, CLIENT_SECRET)
+
+    # Обе схемы дают одну и ту же подпись
+    signature, t, nonce = sign_legacy("POST", URL, payload, ACCESS_TOKEN)
+    assert signer.sign("POST", URL, prepared.sha256, ACCESS_TOKEN, t, nonce)[0] == signature
+
+    report = {
+        "count": args.count,
+        "legacy_per_second": round(rate(lambda: sign_legacy("POST", URL, payload, ACCESS_TOKEN), args.count)),
+        "signer_per_second": round(rate(lambda: signer.sign("POST", URL, serialize_body(payload)[1], ACCESS_TOKEN), args.count)),
+        "signer_prepared_per_second": round(rate(lambda: signer.sign("POST", URL, prepared.sha256, ACCESS_TOKEN), args.count))
+    }
+    report["speedup_prepared"] = round(report["signer_prepared_per_second"] / report["legacy_per_second"], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import hashlib
+import hmac
+import json
+import time
+import uuid
+
+# Подпись запросов Tuya Cloud (HMAC-SHA256, sign_method=HMAC-SHA256):
+#   sign = HMAC(secret, client_id [+ access_token] + t + nonce + stringToSign)
+#   stringToSign = METHOD \n Content-SHA256 \n Headers \n URL
+# Модуль не зависит от config.py - его используют tuya_client.py, fingerbot.py и бенчмарк.
+
+EMPTY_BODY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+class PreparedBody:
+    """Тело запроса, сериализованное один раз: payload, байты JSON и их SHA-256"""
+
+    __slots__ = ("payload", "body", "sha256")
+
+    def __init__(self, payload):
+        self.payload = payload
+        # Те же разделители, что у requests (json=) - байты совпадают с прежними
+        self.body = json.dumps(payload).encode("utf-8")
+        self.sha256 = hashlib.sha256(self.body).hexdigest()
+
+
+def serialize_body(payload):
+    """Тело запроса -> (байты для отправки, их SHA-256).
+
+    Тело сериализуется один раз, и хэшируются ровно те байты, что уйдут в запрос
+    (data=, а не json=, который сериализует payload заново).
+    """
+    if payload is None or payload == "" or payload == b"":
+        return None, EMPTY_BODY_SHA256
+    if isinstance(payload, PreparedBody):
+        return payload.body, payload.sha256
+    if isinstance(payload, str):
+        body = payload.encode("utf-8")
+    elif isinstance(payload, bytes):
+        body = payload
+    else:
+        body = json.dumps(payload).encode("utf-8")
+    return body, hashlib.sha256(body).hexdigest()
+
+
+class Signer:
+    """Подписывает запросы проекта: ключ HMAC подготовлен один раз, на подпись - copy()"""
+
+    def __init__(self, client_id, client_secret):
+        self.client_id = client_id
+        # HMAC с уже обработанным ключом и client_id - общий префикс всех подписей
+        self._keyed = hmac.new(client_secret.encode("utf-8"), client_id.encode("utf-8"), hashlib.sha256)
+
+    def sign(self, method, url, body_sha256=EMPTY_BODY_SHA256, access_token=None, t=None, nonce=None):
+        """(sign, t, nonce) для запроса; access_token=None - запрос токена"""
+        if t is None:
+            t = str(int(time.time() * 1000))
+        if nonce is None:
+            nonce = str(uuid.uuid4())
+        mac = self._keyed.copy()
+        # Пустая строка заголовков: собственные подписываемые заголовки не используются
+        mac.update(f"{access_token or ''}{t}{nonce}{method.upper()}\n{body_sha256}\n\n{url}".encode("utf-8"))
+        return mac.hexdigest().upper(), t, nonce
@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StatusCache:
+    """Кэш статуса устройств с TTL и отдачей устаревших данных на время обновления"""
+
+    def __init__(self, ttl=60, stale_ttl=300):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = {}
+        self._generations = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def get(self, key, loader):
+        """Вернуть статус из кэша или загрузить его через loader()"""
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generations.get(key, 0)
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = now - stored_at
+                if age < self.ttl:
+                    self.hits += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    # Отдаем устаревшие данные сразу, обновляем в фоне
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(
+                            target=self._revalidate,
+                            args=(key, loader, generation),
+                            daemon=True
+                        ).start()
+                    return value
+            self.misses += 1
+
+        value = loader()
+        self.set(key, value, generation)
+        return value
+
+    def peek(self, key):
+        """Свежий статус из кэша без загрузки (None - нет или устарел)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def generation(self, key):
+        """Текущее поколение ключа: передается в set() для ответа, запрошенного сейчас"""
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def set(self, key, value, generation=None):
+        """Сохранить результат (кэшируются только успешные ответы)"""
+        if not value.get("success"):
+            return
+        with self._lock:
+            # Ответ, запрошенный до invalidate(), уже не актуален
+            if generation is not None and generation != self._generations.get(key, 0):
+                return
+            self._entries[key] = (value, time.monotonic())
+
+    def _revalidate(self, key, loader, generation):
+        try:
+            self.set(key, loader(), generation)
+            with self._lock:
+                self.revalidations += 1
+        except Exception as e:
+            # Оставляем устаревшие данные, следующий запрос попробует снова
+            logger.warning("⚠️ Не удалось обновить статус %s: %s", key, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def invalidate(self, key):
+        """Сбросить статус устройства (например, после команды)"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def stats(self):
+        """Статистика попаданий в кэш"""
+        with self._lock:
+            total = self.hits + self.stale_hits + self.misses
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "entries": len(self._entries),
+                "hit_ratio": round((self.hits + self.stale_hits) / total, 3) if total else None,
+                "ttl": self.ttl,
+                "stale_ttl": self.stale_ttl
+            }
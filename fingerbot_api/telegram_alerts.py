@@ -0,0 +1,30 @@
+import logging
+import requests
+import http_pool
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API = "https://api.telegram.org"
+
+
+def send_alert(bot_token, chat_ids, text, timeout=10):
+    """Отправить сообщение администраторам через Telegram Bot API, вернуть число доставленных"""
+    if not bot_token or not chat_ids:
+        return 0
+
+    session = http_pool.get_session(TELEGRAM_API)
+    delivered = 0
+    for chat_id in chat_ids:
+        try:
+            response = session.post(
+                f"{TELEGRAM_API}/bot{bot_token}/sendMessage",
+                json={"chat_id": chat_id, "text": text, "parse_mode": "Markdown"},
+                timeout=timeout
+            )
+            if response.status_code == 200:
+                delivered += 1
+            else:
+                logger.warning("⚠️ Telegram не принял оповещение для %s: HTTP %s", chat_id, response.status_code)
+        except requests.exceptions.RequestException as e:
+            logger.warning("⚠️ Не удалось отправить оповещение в %s: %s", chat_id, e)
+    return delivered
@@ -0,0 +1,101 @@
+"""Регрессионный тест circuit breaker: неожиданное исключение пробы не оставляет его полуоткрытым.
+
+python -m unittest test_resilience   (из каталога fingerbot_api)
+"""
+import os
+import time
+import unittest
+
+# tuya_client читает config при импорте - достаточно тестовых значений
+os.environ.setdefault("TUYA_CLIENT_ID", "testclientid")
+os.environ.setdefault("TUYA_CLIENT_SECRET", "testsecret0000000000000000000000")
+os.environ.setdefault("TUYA_DEVICE_ID", "testdevice")
+os.environ["TUYA_TOKEN_STORE"] = ""
+
+import requests
+import tuya_client
+from resilience import CircuitBreaker, CircuitOpenError
+from rate_limiter import RateLimiter, TokenBucket
+
+
+class _Response:
+    status_code = 200
+
+
+class SendWithRetriesBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.original = tuya_client.circuit_breaker
+        self.breaker = tuya_client.circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+
+    def tearDown(self):
+        tuya_client.circuit_breaker = self.original
+
+    def call(self, error=None):
+        def send(timeout):
+            if error is not None:
+                raise error
+            return _Response()
+        # Запись: без повторов, чтобы каждая попытка была одним вызовом breaker
+        return tuya_client.send_with_retries("write", send, idempotent=False)
+
+    def open_breaker(self):
+        for _ in range(self.breaker.failure_threshold):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                self.call(requests.exceptions.ConnectionError())
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.call()
+        time.sleep(self.breaker.reset_timeout)
+
+    def test_unexpected_probe_error_reopens_and_recovers(self):
+        self.open_breaker()
+
+        # Проба в полуоткрытом состоянии падает с исключением вне списка сетевых ошибок
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            self.call(requests.exceptions.ChunkedEncodingError())
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        # После reset_timeout следующая проба проходит и замыкает breaker
+        time.sleep(self.breaker.reset_timeout)
+        self.assertEqual(self.call().status_code, 200)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.call().status_code, 200)
+
+    def test_interrupted_probe_releases_breaker(self):
+        self.open_breaker()
+
+        with self.assertRaises(KeyboardInterrupt):
+            self.call(KeyboardInterrupt())
+        # Проба снята без учета сбоя: следующий вызов снова пробует
+        self.assertEqual(self.call().status_code, 200)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+
+class SendWithRetriesRateLimitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.originals = tuya_client.circuit_breaker, tuya_client.rate_limiter
+        tuya_client.circuit_breaker = CircuitBreaker(failure_threshold=100)
+        # Один слот на повтор и без ожидания; первую попытку вызывающий учел сам
+        tuya_client.rate_limiter = RateLimiter({"read": TokenBucket(0.001, 1)}, max_wait=0)
+
+    def tearDown(self):
+        tuya_client.circuit_breaker, tuya_client.rate_limiter = self.originals
+
+    def test_retries_stop_without_rate_limit_slot(self):
+        attempts = []
+
+        def send(timeout):
+            attempts.append(timeout)
+            raise requests.exceptions.Timeout()
+
+        self.assertGreaterEqual(tuya_client.TUYA_MAX_RETRIES, 2)
+        with self.assertRaises(requests.exceptions.Timeout):
+            tuya_client.send_with_retries("read", send, idempotent=True)
+        # Первая попытка и один повтор: второму повтору слота не хватило
+        self.assertEqual(len(attempts), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
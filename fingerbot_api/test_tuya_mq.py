@@ -0,0 +1,110 @@
+"""Тест push-подписки: битые кадры пропускаются, подписка продолжает обновлять состояние.
+
+python -m unittest test_tuya_mq   (из каталога fingerbot_api, нужен пакет cryptography)
+"""
+import asyncio
+import base64
+import json
+import threading
+import time
+import unittest
+
+from aiohttp import web
+
+import tuya_mq
+from device_state import DeviceStateStore
+
+ACCESS_KEY = "testsecret0000000000000000000000"
+
+
+def wait_until(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def status_frame(device_id, value, message_id="1"):
+    """Кадр Pulsar с событием о заряде, зашифрованный как у Tuya"""
+    envelope = {
+        "protocol": tuya_mq.PROTOCOL_STATUS,
+        "t": int(time.time() * 1000),
+        "data": tuya_mq.encrypt_data(
+            {"devId": device_id, "status": [{"code": "battery_percentage", "value": value, "t": 1}]},
+            ACCESS_KEY
+        )
+    }
+    return {"messageId": message_id, "payload": base64.b64encode(json.dumps(envelope).encode()).decode()}
+
+
+@unittest.skipIf(tuya_mq.Cipher is None, "нужен пакет cryptography")
+class LocalPublisherTest(unittest.TestCase):
+
+    def test_malformed_frame_is_skipped(self):
+        store = DeviceStateStore()
+        store.seed("dev1", [{"code": "battery_percentage", "value": 90}])
+        transport = tuya_mq.LocalTransport()
+        subscriber = tuya_mq.PushSubscriber(transport, ACCESS_KEY, store)
+        publisher = tuya_mq.LocalPublisher(transport, ACCESS_KEY)
+        subscriber.start()
+        try:
+            transport.publish({"messageId": "bad", "payload": "не base64"})
+            publisher.publish_status("dev1", [{"code": "battery_percentage", "value": 42}])
+            self.assertTrue(wait_until(lambda: subscriber.received == 1))
+
+            self.assertEqual(subscriber.errors, 1)
+            self.assertEqual(store.get("dev1"), [{"code": "battery_percentage", "value": 42}])
+            self.assertTrue(subscriber.status()["alive"])
+        finally:
+            subscriber.stop()
+
+
+@unittest.skipIf(tuya_mq.Cipher is None, "нужен пакет cryptography")
+class WebSocketTransportTest(unittest.TestCase):
+
+    def test_invalid_json_does_not_stop_subscription(self):
+        acks = []
+        loop = asyncio.new_event_loop()
+
+        async def consumer(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            await ws.send_str("{не json")
+            await ws.send_json(status_frame("dev1", 33))
+            async for message in ws:
+                acks.append(json.loads(message.data)["messageId"])
+            return ws
+
+        async def start_server():
+            app = web.Application()
+            app.router.add_get("/{tail:.*}", consumer)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            return runner, site._server.sockets[0].getsockname()[1]
+
+        server_thread = threading.Thread(target=loop.run_forever, daemon=True)
+        server_thread.start()
+        runner, port = asyncio.run_coroutine_threadsafe(start_server(), loop).result(5)
+
+        store = DeviceStateStore()
+        store.seed("dev1", [])
+        transport = tuya_mq.WebSocketTransport(f"http://127.0.0.1:{port}/", "testid", ACCESS_KEY, reconnect_delay=0.1)
+        subscriber = tuya_mq.PushSubscriber(transport, ACCESS_KEY, store)
+        subscriber.start()
+        try:
+            self.assertTrue(wait_until(lambda: subscriber.received == 1))
+            self.assertEqual(store.get("dev1"), [{"code": "battery_percentage", "value": 33}])
+            self.assertTrue(wait_until(lambda: acks == ["1"]))
+            self.assertTrue(subscriber.status()["alive"])
+        finally:
+            subscriber.stop()
+            asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result(5)
+            loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import json
+import logging
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессная блокировка недоступна
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenStore:
+    """Общий для всех процессов хоста файл с токеном доступа Tuya"""
+
+    def __init__(self, path, client_id):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.client_id = client_id or ""
+
+    def load(self):
+        """Прочитать токен: (access_token, expire_at) или None"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # Файл мог остаться от других учетных данных
+        if record.get("client_id") != self.client_id:
+            return None
+        if not record.get("access_token"):
+            return None
+        return record["access_token"], float(record.get("expire_at", 0))
+
+    def save(self, access_token, expire_at):
+        """Атомарно записать токен (читатели не увидят недописанный файл)"""
+        record = {
+            "client_id": self.client_id,
+            "access_token": access_token,
+            "expire_at": expire_at
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("⚠️ Не удалось сохранить токен в %s: %s", self.path, e)
+
+    @contextmanager
+    def exclusive(self):
+        """Эксклюзивная блокировка на время получения нового токена"""
+        if fcntl is None:
+            yield
+            return
+
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
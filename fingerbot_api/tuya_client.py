@@ -1,11 +1,31 @@
 import json
-import requests
-import hashlib
-import hmac
+import logging
+import re
+import threading
 import time
-import uuid
-from urllib.parse import urlencode
-from config import CLIENT_ID, CLIENT_SECRET, TUYA_REGION
+from contextlib import nullcontext
+
+import requests
+import urllib3
+
+import http_pool
+import metrics
+from token_store import TokenStore
+from singleflight import SingleFlight
+from rate_limiter import RateLimiter, TokenBucket
+from resilience import CircuitBreaker, CircuitOpenError, backoff_delay
+from signature import Signer, serialize_body
+from config import (
+    CLIENT_ID, CLIENT_SECRET, TUYA_REGION, TUYA_POOL_SIZE, TUYA_POOL_IDLE_TIMEOUT,
+    TUYA_TOKEN_RENEW_AHEAD, TUYA_TOKEN_STORE,
+    TUYA_RATE_TOKEN, TUYA_RATE_READ, TUYA_RATE_WRITE, TUYA_RATE_BURST,
+    TUYA_DAILY_LIMIT, TUYA_RATE_MAX_WAIT,
+    TUYA_CONNECT_TIMEOUT, TUYA_TOKEN_TIMEOUT, TUYA_READ_TIMEOUT, TUYA_WRITE_TIMEOUT,
+    TUYA_MAX_RETRIES, TUYA_RETRY_BACKOFF, TUYA_RETRY_BACKOFF_MAX,
+    TUYA_BREAKER_THRESHOLD, TUYA_BREAKER_RESET
+)
+
+logger = logging.getLogger(__name__)
 
 # Базовые URL для разных регионов
 REGION_URLS = {
@@ -18,24 +38,126 @@ def get_base_url():
     """Получить базовый URL для региона"""
     return REGION_URLS.get(TUYA_REGION, "https://openapi.tuyaeu.com")
 
+http_pool.configure(size=TUYA_POOL_SIZE, idle=TUYA_POOL_IDLE_TIMEOUT)
+
+def get_session():
+    """Получить keep-alive сессию для текущего региона"""
+    return http_pool.get_session(get_base_url())
+
+def warm_up_connections():
+    """Прогреть соединение с Tuya Cloud и запустить очистку простаивающих"""
+    http_pool.start_reaper()
+    return http_pool.warm_up(get_base_url())
+
+# Клиентские лимиты вызовов Tuya: лучше немного подождать, чем получить отказ от облака
+rate_limiter = RateLimiter(
+    {
+        "token": TokenBucket(TUYA_RATE_TOKEN, max(1, TUYA_RATE_BURST // 5)),
+        "read": TokenBucket(TUYA_RATE_READ, TUYA_RATE_BURST),
+        "write": TokenBucket(TUYA_RATE_WRITE, TUYA_RATE_BURST)
+    },
+    daily_limit=TUYA_DAILY_LIMIT,
+    max_wait=TUYA_RATE_MAX_WAIT
+)
+
+def rate_limit_kind(method):
+    """Вид лимита для HTTP метода"""
+    return "read" if method == "GET" else "write"
+
+def rate_limited_response():
+    """Ответ при исчерпанном лимите (в том же формате, что и ошибки Tuya)"""
+    return {
+        "success": False,
+        "error": "Rate limit exceeded",
+        "rate_limits": rate_limiter.status()
+    }
+
+# Таймауты (connect, read) по видам операций
+TIMEOUTS = {
+    "token": (TUYA_CONNECT_TIMEOUT, TUYA_TOKEN_TIMEOUT),
+    "read": (TUYA_CONNECT_TIMEOUT, TUYA_READ_TIMEOUT),
+    "write": (TUYA_CONNECT_TIMEOUT, TUYA_WRITE_TIMEOUT)
+}
+
+# Пока Tuya Cloud недоступен, вызовы отклоняются сразу, а не занимают воркеры на весь таймаут
+circuit_breaker = CircuitBreaker(TUYA_BREAKER_THRESHOLD, TUYA_BREAKER_RESET)
+
+def circuit_open_response(retry_after):
+    """Ответ при разомкнутом circuit breaker"""
+    return {
+        "success": False,
+        "error": "Tuya Cloud unavailable (circuit open)",
+        "retry_after": round(retry_after, 1)
+    }
+
+def request_not_sent(error):
+    """Соединение не установлено - запрос точно не дошел до сервера"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+def send_with_retries(kind, send, idempotent):
+    """Выполнить send(timeout) с повторами и через circuit breaker.
+    
+    Чтения (idempotent) повторяются при таймаутах, ошибках соединения и 5xx.
+    Записи - только если запрос не был отправлен, чтобы не нажать дважды.
+    send вызывается заново на каждую попытку (свежие t и nonce в подписи).
+    Первую попытку вызывающий уже учел в rate_limiter, каждый повтор берет свой слот:
+    без слота повторов больше нет.
+    """
+    attempt = 0
+    while True:
+        if not circuit_breaker.allow():
+            raise CircuitOpenError(circuit_breaker.retry_after())
+        
+        try:
+            response = send(TIMEOUTS[kind])
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            circuit_breaker.record_failure()
+            if attempt < TUYA_MAX_RETRIES and (idempotent or request_not_sent(e)) and rate_limiter.acquire(kind):
+                attempt += 1
+                time.sleep(backoff_delay(attempt, TUYA_RETRY_BACKOFF, TUYA_RETRY_BACKOFF_MAX))
+                continue
+            raise
+        except Exception:
+            # ChunkedEncodingError, TooManyRedirects и т.п.: проба тоже должна завершиться,
+            # иначе breaker навсегда останется полуоткрытым
+            circuit_breaker.record_failure()
+            raise
+        except BaseException:
+            circuit_breaker.release()
+            raise
+        
+        if response.status_code >= 500:
+            circuit_breaker.record_failure()
+            if attempt < TUYA_MAX_RETRIES and idempotent and rate_limiter.acquire(kind):
+                attempt += 1
+                time.sleep(backoff_delay(attempt, TUYA_RETRY_BACKOFF, TUYA_RETRY_BACKOFF_MAX))
+                continue
+            return response
+        
+        circuit_breaker.record_success()
+        return response
+
 # Global token storage
 access_token = None
 token_expiry = 0
+token_obtained_at = 0
 
-def generate_nonce():
-    """Generate UUID for nonce"""
-    return str(uuid.uuid4())
+# Запас до истечения, после которого токен считается устаревшим
+TOKEN_EXPIRY_MARGIN = 300
+
+# Обновление токена выполняется одним потоком, остальные ждут его результат
+_token_lock = threading.Lock()
+_renewer_thread = None
+
+# Токен хранится в файле, общем для всех воркеров на хосте, и переживает перезапуск
+_token_store = TokenStore(TUYA_TOKEN_STORE, CLIENT_ID) if TUYA_TOKEN_STORE else None
 
 def calculate_content_sha256(body):
     """Calculate SHA256 of request body"""
-    if body is None or body == "":
-        # Empty body SHA256
-        return "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855"
-    
-    if isinstance(body, dict):
-        body = json.dumps(body)
-    
-    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+    return serialize_body(body)[1]
 
 def build_url(path, params=None):
     """Build URL with sorted parameters"""
@@ -47,6 +169,16 @@ def build_url(path, params=None):
     query_string = "&".join([f"{k}={v}" for k, v in sorted_params])
     return f"{path}?{query_string}"
 
+# Ключ HMAC подготавливается один раз на процесс
+signer = Signer(CLIENT_ID or "", CLIENT_SECRET or "")
+
+def sign_request(method, url, body_sha256, access_token=None):
+    """Подпись запроса по уже посчитанному SHA-256 тела: (sign, t, nonce)"""
+    started = time.perf_counter()
+    result = signer.sign(method, url, body_sha256, access_token)
+    sign_seconds.observe(time.perf_counter() - started)
+    return result
+
 def generate_signature(method, url, body, access_token=None, custom_headers=None):
     """Generate signature according to Tuya documentation"""
     
@@ -54,148 +186,285 @@ def generate_signature(method, url, body, access_token=None, custom_headers=None
     if not CLIENT_ID or not CLIENT_SECRET:
         raise ValueError("CLIENT_ID или CLIENT_SECRET не установлены в .env файле")
     
-    # Timestamp
-    t = str(int(time.time() * 1000))
-    
-    # Nonce
-    nonce = generate_nonce()
-    
-    # Content SHA256
-    content_sha256 = calculate_content_sha256(body)
-    
-    # Build stringToSign
-    string_to_sign_parts = [
-        method.upper(),
-        content_sha256,
-        "",  # Empty headers for now (no custom signature headers)
-        url
-    ]
-    string_to_sign = "\n".join(string_to_sign_parts)
-    
-    # Build the string for HMAC - безопасная конкатенация
-    client_id_str = CLIENT_ID or ""
-    access_token_str = access_token or ""
-    
-    if access_token:
-        # General business API
-        str_for_hmac = client_id_str + access_token_str + t + nonce + string_to_sign
-    else:
-        # Token management API
-        str_for_hmac = client_id_str + t + nonce + string_to_sign
-    
-    # Generate signature - безопасное кодирование
-    client_secret_bytes = (CLIENT_SECRET or "").encode('utf-8')
-    str_for_hmac_bytes = str_for_hmac.encode('utf-8')
-    
-    signature = hmac.new(
-        client_secret_bytes,
-        str_for_hmac_bytes,
-        hashlib.sha256
-    ).hexdigest().upper()
-    
-    return signature, t, nonce
+    return sign_request(method, url, calculate_content_sha256(body), access_token)
 
-def get_access_token():
-    """Get access token with correct signature"""
-    global access_token, token_expiry
-    
-    # Check if token is still valid
-    if access_token and time.time() < token_expiry - 300:
+def peek_access_token(margin=TOKEN_EXPIRY_MARGIN):
+    """Вернуть текущий токен без сетевого запроса (None, если он истекает)"""
+    if access_token and time.time() < token_expiry - margin:
         return access_token
-    
+    return None
+
+def _set_access_token(token, expire_at):
+    global access_token, token_expiry, token_obtained_at
+    # Сначала срок, затем сам токен: читатели без блокировки не увидят новый токен со старым сроком
+    token_expiry = expire_at
+    if token != access_token:
+        token_obtained_at = time.time()
+    access_token = token
+
+def store_access_token(token, expires_in):
+    """Сохранить полученный токен (в памяти и в общем хранилище)"""
+    expire_at = time.time() + expires_in
+    _set_access_token(token, expire_at)
+    if _token_store is not None:
+        _token_store.save(token, expire_at)
+
+def load_shared_access_token(margin=TOKEN_EXPIRY_MARGIN):
+    """Взять токен, полученный другим процессом (None, если его нет или он истекает)"""
+    if _token_store is None:
+        return None
+    record = _token_store.load()
+    if record is None:
+        return None
+    token, expire_at = record
+    if time.time() >= expire_at - margin:
+        return None
+    _set_access_token(token, expire_at)
+    return token
+
+def shared_token_lock():
+    """Межпроцессная блокировка получения токена (без общего хранилища - пустая)"""
+    if _token_store is None:
+        return nullcontext()
+    return _token_store.exclusive()
+
+def _fetch_access_token():
+    """Запросить новый токен у Tuya Cloud"""
     try:
         # Token management API parameters
         params = {"grant_type": "1"}
         url = build_url("/v1.0/token", params)
-        
-        # Generate signature for token request
-        signature, t, nonce = generate_signature("GET", url, None)
-        
-        headers = {
-            "client_id": CLIENT_ID or "",
-            "sign": signature,
-            "t": t,
-            "nonce": nonce,
-            "sign_method": "HMAC-SHA256"
-        }
-        
         base_url = get_base_url()
         
-        print(f"🔐 Получение токена...")
-        print(f"   URL: {base_url}{url}")
+        def send(timeout):
+            # Generate signature for token request
+            signature, t, nonce = generate_signature("GET", url, None)
+            
+            headers = {
+                "client_id": CLIENT_ID or "",
+                "sign": signature,
+                "t": t,
+                "nonce": nonce,
+                "sign_method": "HMAC-SHA256"
+            }
+            
+            # GET request for token
+            return get_session().get(
+                f"{base_url}{url}",
+                headers=headers,
+                timeout=timeout
+            )
         
-        # GET request for token
-        response = requests.get(
-            f"{base_url}{url}",
-            headers=headers,
-            timeout=10
-        )
+        if not rate_limiter.acquire("token"):
+            logger.error("❌ Лимит запросов токена исчерпан")
+            return None
+        
+        logger.info("🔐 Получение токена: %s%s", base_url, url)
         
-        print(f"   Response Status: {response.status_code}")
+        with token_fetch_seconds.time():
+            response = send_with_retries("token", send, idempotent=True)
+        tuya_requests_total.inc(endpoint="/v1.0/token", method="GET", status=response.status_code)
         
         if response.status_code == 200:
-            data = response.json()
+            with json_decode_seconds.time():
+                data = response.json()
             
             if data.get("success"):
-                access_token = data["result"]["access_token"]
-                token_expiry = time.time() + data["result"]["expire_time"]
-                print(f"✅ Токен получен успешно!")
-                print(f"   Expires in: {data['result']['expire_time']} секунд")
+                store_access_token(data["result"]["access_token"], data["result"]["expire_time"])
+                logger.info("✅ Токен получен, действует %s с", data["result"]["expire_time"])
                 return access_token
             else:
                 error_msg = data.get("msg", "Unknown error")
-                print(f"❌ Ошибка получения токена: {error_msg}")
+                logger.error("❌ Ошибка получения токена: %s", error_msg)
                 return None
         else:
-            print(f"❌ HTTP ошибка: {response.status_code}")
+            logger.error("❌ Ошибка получения токена: HTTP %s", response.status_code)
             return None
             
+    except CircuitOpenError as e:
+        tuya_requests_total.inc(endpoint="/v1.0/token", method="GET", status="circuit_open")
+        logger.error("❌ Tuya Cloud недоступен, повтор через %.0f с", e.retry_after)
+        return None
+    except requests.exceptions.RequestException as e:
+        tuya_requests_total.inc(endpoint="/v1.0/token", method="GET", status="error")
+        # Сетевые сбои штатны во время аварии облака - без трассировки на каждую попытку
+        logger.error("❌ Не удалось получить токен: %s", e)
+        return None
     except Exception as e:
-        print(f"❌ Исключение при получении токена: {e}")
+        tuya_requests_total.inc(endpoint="/v1.0/token", method="GET", status="error")
+        logger.exception("❌ Исключение при получении токена: %s", e)
         return None
 
-def call_tuya_api_v2(endpoint, method="GET", payload=None, params=None):
-    """Make API call to Tuya IoT Core API v2.0 with correct signature"""
+def refresh_access_token(ahead=TOKEN_EXPIRY_MARGIN):
+    """Обновить токен, если до истечения осталось меньше ahead секунд"""
+    with _token_lock:
+        # Пока мы ждали блокировку, токен мог обновить другой поток или процесс
+        token = peek_access_token(ahead) or load_shared_access_token(ahead)
+        if token:
+            return token
+        if _token_store is None:
+            return _fetch_access_token()
+        
+        with _token_store.exclusive():
+            token = load_shared_access_token(ahead)
+            if token:
+                return token
+            return _fetch_access_token()
+
+def get_access_token():
+    """Get access token with correct signature"""
+    token = peek_access_token()
+    if token:
+        return token
+    return refresh_access_token()
+
+def _token_renewer_loop():
+    while True:
+        token = refresh_access_token(TUYA_TOKEN_RENEW_AHEAD)
+        if token:
+            delay = token_expiry - TUYA_TOKEN_RENEW_AHEAD - time.time()
+        else:
+            delay = 0
+        # Не чаще раза в 30 секунд, в том числе при ошибках получения токена
+        time.sleep(max(30, delay))
+
+def start_token_renewer():
+    """Запустить фоновое обновление токена заранее, до истечения запаса"""
+    global _renewer_thread
+    with _token_lock:
+        if _renewer_thread is None:
+            _renewer_thread = threading.Thread(
+                target=_token_renewer_loop,
+                name="tuya-token-renewer",
+                daemon=True
+            )
+            _renewer_thread.start()
+    return _renewer_thread
+
+# Метрики: время получения токена, подписи, сети и разбора JSON, вызовы по эндпоинтам
+token_fetch_seconds = metrics.registry.histogram(
+    "tuya_token_fetch_seconds", "Время получения токена доступа Tuya (с повторами)"
+)
+sign_seconds = metrics.registry.histogram(
+    "tuya_sign_seconds", "Время подписи запроса к Tuya",
+    buckets=(0.00001, 0.00002, 0.00005, 0.0001, 0.0002, 0.0005, 0.001, 0.005)
+)
+tuya_request_seconds = metrics.registry.histogram(
+    "tuya_request_seconds", "Сетевое время запроса к Tuya (с повторами)", labels=("endpoint", "method")
+)
+json_decode_seconds = metrics.registry.histogram(
+    "tuya_json_decode_seconds", "Время разбора JSON ответа Tuya",
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01)
+)
+tuya_requests_total = metrics.registry.counter(
+    "tuya_requests_total", "Вызовы Tuya API по эндпоинтам и результату", labels=("endpoint", "method", "status")
+)
+metrics.registry.gauge(
+    "tuya_token_age_seconds", "Возраст текущего токена доступа",
+    lambda: time.time() - token_obtained_at if access_token else None
+)
+metrics.registry.gauge(
+    "tuya_token_expires_in_seconds", "Время до истечения токена доступа",
+    lambda: token_expiry - time.time() if access_token else None
+)
+metrics.registry.gauge(
+    "tuya_circuit_open", "Circuit breaker разомкнут (1) или нет (0)",
+    lambda: int(circuit_breaker.status()["state"] != "closed")
+)
+metrics.registry.gauge(
+    "tuya_rate_limit_remaining", "Оставшийся бюджет вызовов по видам лимитов",
+    lambda: {kind: bucket.remaining() for kind, bucket in rate_limiter.buckets.items()},
+    label="kind"
+)
+
+# Id устройств в пути заменяются на {id}, чтобы число серий не росло с парком устройств
+_ID_SEGMENT = re.compile(r"/(devices|thing)/[^/?]+")
+
+def endpoint_label(endpoint):
+    """Эндпоинт Tuya для метрик: /v1.0/devices/{id}/status"""
+    return _ID_SEGMENT.sub(r"/\1/{id}", endpoint)
+
+# Одинаковые одновременные GET-запросы объединяются в один вызов Tuya
+inflight_reads = SingleFlight()
+
+def call_tuya_api_v2(endpoint, method="GET", payload=None, params=None, idempotent=None):
+    """Make API call to Tuya IoT Core API v2.0 with correct signature
+    
+    idempotent: можно ли повторять запрос после таймаута (по умолчанию - только GET).
+    """
+    if idempotent is None:
+        idempotent = method == "GET"
+    if method == "GET":
+        return inflight_reads.do(
+            build_url(endpoint, params),
+            lambda: _call_tuya_api(endpoint, method, payload, params, idempotent)
+        )
+    return _call_tuya_api(endpoint, method, payload, params, idempotent)
+
+def _call_tuya_api(endpoint, method, payload, params, idempotent):
+    """Выполнить один подписанный запрос к Tuya API (с повторами)"""
+    if method not in ("GET", "POST"):
+        return {"success": False, "error": f"Unsupported method: {method}"}
+    
     token = get_access_token()
     if not token:
         return {"success": False, "error": "Failed to get access token"}
     
+    kind = rate_limit_kind(method)
+    label = endpoint_label(endpoint)
+    if not rate_limiter.acquire(kind):
+        tuya_requests_total.inc(endpoint=label, method=method, status="rate_limited")
+        return rate_limited_response()
+    
+    status = "error"
     try:
         # Build URL with parameters
         url = build_url(endpoint, params)
         
-        # Generate signature for API call
-        signature, t, nonce = generate_signature(method, url, payload, token)
-        
-        headers = {
-            "client_id": CLIENT_ID or "",
-            "access_token": token,
-            "sign": signature,
-            "t": t,
-            "nonce": nonce,
-            "sign_method": "HMAC-SHA256",
-            "Content-Type": "application/json"
-        }
-        
         base_url = get_base_url()
         full_url = f"{base_url}{url}"
         
-        print(f"🌐 API v2.0 Call: {method} {full_url}")
+        # Тело сериализуется один раз (и для повторов): подписываются ровно отправляемые байты
+        body, body_sha256 = serialize_body(payload if method == "POST" else None)
         
-        # Выполняем запрос и сразу обрабатываем ответ
-        if method == "GET":
-            response = requests.get(full_url, headers=headers, timeout=10)
-        elif method == "POST":
-            response = requests.post(full_url, headers=headers, json=payload, timeout=10)
-        else:
-            return {"success": False, "error": f"Unsupported method: {method}"}
+        def send(timeout):
+            # Generate signature for API call
+            signature, t, nonce = sign_request(method, url, body_sha256, token)
+            # Подпись и тело собираются в строку, только если DEBUG включен
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Tuya %s %s t=%s nonce=%s sign=%s body=%s",
+                    method, url, t, nonce, signature, body.decode("utf-8") if body else "-"
+                )
+            
+            headers = {
+                "client_id": CLIENT_ID or "",
+                "access_token": token,
+                "sign": signature,
+                "t": t,
+                "nonce": nonce,
+                "sign_method": "HMAC-SHA256",
+                "Content-Type": "application/json"
+            }
+            
+            session = get_session()
+            if method == "GET":
+                return session.get(full_url, headers=headers, timeout=timeout)
+            return session.post(full_url, headers=headers, data=body, timeout=timeout)
         
-        print(f"   Response Status: {response.status_code}")
+        # Выполняем запрос и сразу обрабатываем ответ
+        with tuya_request_seconds.time(endpoint=label, method=method):
+            response = send_with_retries(kind, send, idempotent)
+        status = response.status_code
         
         if response.status_code == 200:
-            data = response.json()
+            with json_decode_seconds.time():
+                data = response.json()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Tuya %s %s -> %s", method, url, json.dumps(data, ensure_ascii=False))
             return data
         else:
+            logger.warning("⚠️ Tuya %s %s: HTTP %s", method, label, response.status_code)
             error_response = {
                 "success": False,
                 "error": f"HTTP {response.status_code}",
@@ -203,11 +472,18 @@ def call_tuya_api_v2(endpoint, method="GET", payload=None, params=None):
             }
             return error_response
             
+    except CircuitOpenError as e:
+        status = "circuit_open"
+        return circuit_open_response(e.retry_after)
     except requests.exceptions.Timeout:
+        status = "timeout"
         return {"success": False, "error": "Request timeout"}
     except requests.exceptions.ConnectionError:
+        status = "connection_error"
         return {"success": False, "error": "Connection error"}
     except requests.exceptions.RequestException as e:
         return {"success": False, "error": f"Request exception: {str(e)}"}
     except Exception as e:
         return {"success": False, "error": f"Unexpected error: {str(e)}"}
+    finally:
+        tuya_requests_total.inc(endpoint=label, method=method, status=status)
@@ -0,0 +1,276 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import aiohttp
+
+# cryptography нужна только для push-подписки (pip install cryptography)
+try:
+    from cryptography.hazmat.primitives import padding
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:
+    Cipher = None
+
+logger = logging.getLogger(__name__)
+
+# Серверы Tuya Message Service (Pulsar over WebSocket) по регионам
+MQ_URLS = {
+    "eu": "wss://mqe.tuyaeu.com:8285/",
+    "us": "wss://mqe.tuyaus.com:8285/",
+    "cn": "wss://mqe.tuyacn.com:8285/"
+}
+
+# protocol 4 - отчет о свойствах устройства, 20 - онлайн/офлайн и прочие bizCode
+PROTOCOL_STATUS = 4
+PROTOCOL_BIZ = 20
+
+
+def _require_cryptography():
+    if Cipher is None:
+        raise RuntimeError("Для push-подписки Tuya нужен пакет cryptography: pip install cryptography")
+
+
+def message_key(access_key):
+    """Ключ AES сообщений: символы 8..24 секрета проекта"""
+    return access_key[8:24].encode("utf-8")
+
+
+def decrypt_data(data, access_key, encrypt_model="aes_ecb"):
+    """Расшифровать поле data сообщения (base64) в JSON"""
+    _require_cryptography()
+    raw = base64.b64decode(data)
+    key = message_key(access_key)
+    if encrypt_model == "aes_gcm":
+        # 12 байт nonce, затем шифротекст с тегом
+        plain = AESGCM(key).decrypt(raw[:12], raw[12:], None)
+    else:
+        decryptor = Cipher(algorithms.AES(key), modes.ECB()).decryptor()
+        padded = decryptor.update(raw) + decryptor.finalize()
+        unpadder = padding.PKCS7(128).unpadder()
+        plain = unpadder.update(padded) + unpadder.finalize()
+    return json.loads(plain)
+
+
+def encrypt_data(payload, access_key, encrypt_model="aes_ecb"):
+    """Зашифровать JSON так же, как Tuya (для локального издателя)"""
+    _require_cryptography()
+    plain = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    key = message_key(access_key)
+    if encrypt_model == "aes_gcm":
+        nonce = os.urandom(12)
+        raw = nonce + AESGCM(key).encrypt(nonce, plain, None)
+    else:
+        padder = padding.PKCS7(128).padder()
+        padded = padder.update(plain) + padder.finalize()
+        encryptor = Cipher(algorithms.AES(key), modes.ECB()).encryptor()
+        raw = encryptor.update(padded) + encryptor.finalize()
+    return base64.b64encode(raw).decode("ascii")
+
+
+def decode_frame(frame, access_key):
+    """Кадр Pulsar WebSocket -> (messageId, событие Tuya)"""
+    envelope = json.loads(base64.b64decode(frame["payload"]))
+    encrypt_model = frame.get("properties", {}).get("em", "aes_ecb")
+    event = decrypt_data(envelope["data"], access_key, encrypt_model)
+    event.setdefault("protocol", envelope.get("protocol"))
+    event.setdefault("t", envelope.get("t"))
+    return frame.get("messageId"), event
+
+
+def apply_event(store, event):
+    """Применить событие к хранилищу состояния, вернуть device_id (или None)"""
+    if event.get("protocol") == PROTOCOL_BIZ:
+        biz_data = event.get("bizData", {})
+        device_id = biz_data.get("devId") or event.get("devId")
+        if device_id and event.get("bizCode") in ("online", "offline"):
+            store.apply(device_id, [{"code": "online", "value": event["bizCode"] == "online"}], event.get("t") or 0)
+        return device_id
+
+    device_id = event.get("devId")
+    if device_id and event.get("status"):
+        store.apply(device_id, event["status"], event.get("t") or 0)
+    return device_id
+
+
+def _deliver(on_frame, frame):
+    """Передать кадр обработчику; ошибка одного кадра не останавливает подписку"""
+    try:
+        on_frame(frame)
+    except Exception as e:
+        logger.warning("⚠️ Не удалось обработать кадр Tuya Message Service: %s", e)
+
+
+class WebSocketTransport:
+    """Подписка Tuya Message Service через Pulsar WebSocket"""
+
+    def __init__(self, url, access_id, access_key, env="event", reconnect_delay=5):
+        self.url = (
+            f"{url}ws/v2/consumer/persistent/{access_id}/out/{env}/{access_id}-sub"
+            "?ackTimeoutMillis=3000&subscriptionType=Failover"
+        )
+        password = hashlib.md5(
+            (access_id + hashlib.md5(access_key.encode("utf-8")).hexdigest()).encode("utf-8")
+        ).hexdigest()[8:24]
+        self.headers = {"username": access_id, "password": password}
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+
+    def run(self, on_frame, stop, on_disconnect=None):
+        """Получать кадры до stop.set(), переподключаясь при обрыве"""
+        asyncio.run(self._run(on_frame, stop, on_disconnect))
+
+    async def _run(self, on_frame, stop, on_disconnect):
+        async with aiohttp.ClientSession() as session:
+            while not stop.is_set():
+                try:
+                    async with session.ws_connect(self.url, headers=self.headers, heartbeat=30) as ws:
+                        self.connected = True
+                        logger.info("📡 Подписка Tuya Message Service подключена")
+                        while not stop.is_set():
+                            try:
+                                message = await ws.receive(timeout=1)
+                            except asyncio.TimeoutError:
+                                continue
+                            if message.type != aiohttp.WSMsgType.TEXT:
+                                break
+                            try:
+                                frame = json.loads(message.data)
+                            except ValueError as e:
+                                # Битый кадр пропускается, подписка продолжает работать
+                                logger.warning("⚠️ Некорректный кадр Tuya Message Service: %s", e)
+                                continue
+                            # Подтверждаем и необработанные кадры, иначе Pulsar будет слать их снова
+                            try:
+                                _deliver(on_frame, frame)
+                            finally:
+                                await ws.send_json({"messageId": frame.get("messageId")})
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.warning("⚠️ Подписка Tuya Message Service: %s", e)
+                except Exception:
+                    # Непредвиденная ошибка соединения - как обрыв: переподключение после паузы
+                    logger.exception("⚠️ Подписка Tuya Message Service прервана")
+                finally:
+                    if self.connected and on_disconnect:
+                        on_disconnect()
+                    self.connected = False
+                if not stop.is_set():
+                    await asyncio.sleep(self.reconnect_delay)
+
+
+class LocalTransport:
+    """Транспорт в памяти процесса: вместо Tuya кадры публикует LocalPublisher"""
+
+    def __init__(self):
+        self.frames = queue.Queue()
+        self.connected = False
+
+    def publish(self, frame):
+        self.frames.put(frame)
+
+    def run(self, on_frame, stop, on_disconnect=None):
+        self.connected = True
+        try:
+            while not stop.is_set():
+                try:
+                    frame = self.frames.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                _deliver(on_frame, frame)
+                self.frames.task_done()
+        finally:
+            self.connected = False
+            if on_disconnect:
+                on_disconnect()
+
+
+class LocalPublisher:
+    """Локальная замена Tuya Message Service: кадры в том же формате и с тем же шифрованием"""
+
+    def __init__(self, transport, access_key, encrypt_model="aes_gcm"):
+        self.transport = transport
+        self.access_key = access_key
+        self.encrypt_model = encrypt_model
+        self._message_id = 0
+
+    def publish_event(self, event, protocol=PROTOCOL_STATUS):
+        self._message_id += 1
+        envelope = {
+            "protocol": protocol,
+            "pv": "2.0",
+            "t": int(time.time() * 1000),
+            "data": encrypt_data(event, self.access_key, self.encrypt_model)
+        }
+        self.transport.publish({
+            "messageId": str(self._message_id),
+            "payload": base64.b64encode(json.dumps(envelope).encode("utf-8")).decode("ascii"),
+            "properties": {"em": self.encrypt_model}
+        })
+
+    def publish_status(self, device_id, status):
+        """Отчет устройства о свойствах [{"code", "value"}]"""
+        t = int(time.time() * 1000)
+        self.publish_event({
+            "devId": device_id,
+            "status": [dict(item, t=item.get("t", t)) for item in status]
+        })
+
+
+class PushSubscriber:
+    """Фоновый поток: кадры транспорта -> расшифровка -> хранилище состояния"""
+
+    def __init__(self, transport, access_key, store):
+        self.transport = transport
+        self.access_key = access_key
+        self.store = store
+        self._stop = threading.Event()
+        self._thread = None
+        self.received = 0
+        self.errors = 0
+
+    @property
+    def connected(self):
+        return self.transport.connected
+
+    def handle_frame(self, frame):
+        try:
+            _, event = decode_frame(frame, self.access_key)
+            apply_event(self.store, event)
+            self.received += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning("⚠️ Не удалось обработать событие Tuya: %s", e)
+
+    def _on_disconnect(self):
+        # Пока подписки не было, события могли потеряться - состояние снова берется из опроса
+        self.store.forget()
+
+    def start(self):
+        """Запустить подписку (повторный вызов ничего не делает)"""
+        _require_cryptography()
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self.transport.run,
+                args=(self.handle_frame, self._stop, self._on_disconnect),
+                name="tuya-push",
+                daemon=True
+            )
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        return {
+            "connected": self.connected,
+            "alive": self._thread is not None and self._thread.is_alive(),
+            "received": self.received,
+            "errors": self.errors,
+            "state": self.store.stats()
+        }
@@ -0,0 +1,5 @@
+# WSGI точка входа для продакшена: gunicorn -c gunicorn.conf.py wsgi:app
+# Прогрев соединения, токен и фоновые задачи запускает хук post_worker_init в gunicorn.conf.py
+from app import app
+
+application = app
@@ -8,6 +8,15 @@ def get_project_root():
     """Получение корневой директории проекта"""
     return os.path.dirname(os.path.abspath(__file__))
 
+def get_api_command():
+    """Команда запуска API по API_SERVER: dev (app.py), gunicorn (wsgi.py) или async (async_app.py)"""
+    server = os.getenv("API_SERVER", "dev")
+    if server == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"]
+    if server == "async":
+        return [sys.executable, "async_app.py"]
+    return [sys.executable, "app.py"]
+
 def run_api():
     """Запуск FingerBot API"""
     print("🚀 Запуск FingerBot API...")
@@ -20,11 +29,16 @@ def run_api():
     
     os.chdir(api_dir)
     print(f"📁 Рабочая директория API: {os.getcwd()}")
-    subprocess.run([sys.executable, "app.py"])
+    subprocess.run(get_api_command())
+
+def is_embedded_mode():
+    """Встроенный режим: бот сам управляет устройством, отдельный API не нужен"""
+    return os.getenv("BOT_BACKEND", "http") == "embedded"
 
 def run_telegram_bot():
     """Запуск Telegram бота"""
-    time.sleep(3)  # Даем API время запуститься
+    if not is_embedded_mode():
+        time.sleep(3)  # Даем API время запуститься
     print("🤖 Запуск Telegram бота на aiogram...")
     project_root = get_project_root()
     bot_dir = os.path.join(project_root, "telegram_bot")
@@ -58,14 +72,17 @@ if __name__ == "__main__":
     
     try:
         # Запускаем в отдельных потоках
-        api_thread = threading.Thread(target=run_api)
-        bot_thread = threading.Thread(target=run_telegram_bot)
+        threads = [threading.Thread(target=run_telegram_bot)]
+        if is_embedded_mode():
+            print("🔌 Встроенный режим: FingerBot API не запускается")
+        else:
+            threads.insert(0, threading.Thread(target=run_api))
         
-        api_thread.start()
-        bot_thread.start()
+        for thread in threads:
+            thread.start()
         
-        api_thread.join()
-        bot_thread.join()
+        for thread in threads:
+            thread.join()
         
     except KeyboardInterrupt:
         print("\n🛑 Остановка сервисов...")
@@ -0,0 +1,91 @@
+# telegram_bot/backend.py
+import asyncio
+import sys
+import aiohttp
+
+from bot_config import (
+    BOT_BACKEND, FINGERBOT_API_URL, FINGERBOT_API_DIR,
+    API_POOL_SIZE, API_KEEPALIVE_TIMEOUT, API_TIMEOUT, BOT_CLICK_CONFIRM
+)
+
+
+class ApiError(Exception):
+    """FingerBot API ответил ошибкой HTTP"""
+
+    def __init__(self, status):
+        super().__init__(f"API status {status}")
+        self.status = status
+
+
+class HttpBackend:
+    """Управление устройством через FingerBot API по HTTP"""
+
+    def __init__(self, base_url=FINGERBOT_API_URL):
+        self.base_url = base_url
+        connector = aiohttp.TCPConnector(
+            limit=API_POOL_SIZE,
+            keepalive_timeout=API_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=API_TIMEOUT)
+        )
+
+    async def _get(self, path):
+        async with self.session.get(f"{self.base_url}{path}") as response:
+            if response.status != 200:
+                raise ApiError(response.status)
+            return await response.json()
+
+    async def check_battery(self):
+        """Состояние батареи (ответ /check_battery)"""
+        return await self._get("/check_battery")
+
+    async def quick_click(self, confirm=BOT_CLICK_CONFIRM):
+        """Быстрый клик (ответ /quick_click)"""
+        return await self._get("/quick_click?confirm=1" if confirm else "/quick_click")
+
+    async def close(self):
+        await self.session.close()
+
+
+class EmbeddedBackend:
+    """Управление устройством прямо в процессе бота, без HTTP к FingerBot API"""
+
+    def __init__(self, api_dir=FINGERBOT_API_DIR):
+        if api_dir not in sys.path:
+            sys.path.append(api_dir)
+        import device_control
+        from dispatcher import QueueFull
+        self.device_control = device_control
+        self.queue_full_error = QueueFull
+
+    async def _run(self, fn):
+        # Вызовы Tuya блокирующие - выполняем их в пуле потоков, не останавливая бота
+        try:
+            return await asyncio.to_thread(fn)
+        except self.queue_full_error:
+            return {"success": False, "error": "Device queue is full"}
+
+    async def start(self):
+        """Прогреть соединение с Tuya Cloud и получить токен до первого клика"""
+        await asyncio.to_thread(self.device_control.warm_up)
+
+    async def check_battery(self):
+        """Состояние батареи (как /check_battery)"""
+        return await self._run(self.device_control.check_battery)
+
+    async def quick_click(self, confirm=BOT_CLICK_CONFIRM):
+        """Быстрый клик (как /quick_click)"""
+        return await self._run(lambda: self.device_control.quick_click(confirm=confirm))
+
+    async def close(self):
+        pass
+
+
+def create_backend():
+    """Создать backend согласно BOT_BACKEND"""
+    if BOT_BACKEND == "embedded":
+        return EmbeddedBackend()
+    return HttpBackend()
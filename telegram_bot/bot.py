@@ -1,18 +1,140 @@
 # telegram_bot/bot.py
 import asyncio
 import logging
+import ssl
 import sys
+from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
+from aiogram.types import FSInputFile
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from bot_config import (
+    TELEGRAM_BOT_TOKEN, BOT_BACKEND, TELEGRAM_UPDATES_MODE, TELEGRAM_API_URL,
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_SECRET,
+    WEBHOOK_SSL_CERT, WEBHOOK_SSL_KEY,
+    THROTTLE_LIMITS, THROTTLE_GLOBAL, THROTTLE_NOTIFY_COOLDOWN,
+    BOT_METRICS_HOST, BOT_METRICS_PORT, LOG_LEVEL, LOG_FORMAT, FINGERBOT_API_DIR
+)
+
+# Настройка логирования общая с fingerbot_api
+if FINGERBOT_API_DIR not in sys.path:
+    sys.path.append(FINGERBOT_API_DIR)
+from log_setup import setup_logging
 
 from handlers import router
-from config import TELEGRAM_BOT_TOKEN
+from middlewares import ThrottlingMiddleware, MetricsMiddleware, metrics
+from backend import create_backend, EmbeddedBackend
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+# Настройка логирования: запись в stderr из фонового потока, цикл событий не ждет вывода
+setup_logging(LOG_LEVEL, LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
+async def on_startup(dispatcher: Dispatcher):
+    """Создание backend управления устройством (HTTP сессия к API или встроенный режим)"""
+    backend = create_backend()
+    if isinstance(backend, EmbeddedBackend):
+        await backend.start()
+    logger.info(f"🔌 Режим работы с устройством: {BOT_BACKEND}")
+    # Backend попадает в обработчики как аргумент backend
+    dispatcher["backend"] = backend
+
+async def on_shutdown(dispatcher: Dispatcher):
+    """Закрытие backend (общей HTTP сессии)"""
+    backend = dispatcher.workflow_data.get("backend")
+    if backend is not None:
+        await backend.close()
+
+async def on_webhook_startup(bot: Bot, dispatcher: Dispatcher):
+    """Регистрация webhook в Telegram"""
+    certificate = FSInputFile(WEBHOOK_SSL_CERT) if WEBHOOK_SSL_CERT else None
+    await bot.set_webhook(
+        url=f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+        certificate=certificate,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dispatcher.resolve_used_update_types()
+    )
+    logger.info(f"🔗 Webhook установлен: {WEBHOOK_URL}{WEBHOOK_PATH}")
+
+def create_bot():
+    """Создание бота (с собственным адресом Bot API, если он задан)"""
+    session = None
+    if TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+    return Bot(
+        token=TELEGRAM_BOT_TOKEN,
+        session=session,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+
+def create_dispatcher():
+    """Создание диспетчера с обработчиками"""
+    dp = Dispatcher()
+    # Метрики снаружи антифлуда: отклоненные сообщения тоже попадают в счетчики
+    router.message.middleware(MetricsMiddleware())
+    # Антифлуд до вызова обработчика: лишние сообщения не доходят до API и Tuya
+    router.message.middleware(ThrottlingMiddleware(
+        THROTTLE_LIMITS, THROTTLE_GLOBAL, THROTTLE_NOTIFY_COOLDOWN
+    ))
+    dp.include_router(router)
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    return dp
+
+async def metrics_endpoint(request):
+    """Метрики бота в формате Prometheus"""
+    return web.Response(body=metrics.registry.render().encode("utf-8"), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+async def start_metrics_server():
+    """HTTP сервер /metrics на отдельном порту (если BOT_METRICS_PORT задан)"""
+    if not BOT_METRICS_PORT:
+        return None
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_endpoint)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, BOT_METRICS_HOST, BOT_METRICS_PORT).start()
+    logger.info(f"📊 Метрики бота: http://{BOT_METRICS_HOST}:{BOT_METRICS_PORT}/metrics")
+    return runner
+
+async def run_polling(bot: Bot, dp: Dispatcher):
+    """Получение обновлений через long polling"""
+    # Telegram не отдает обновления через getUpdates, пока установлен webhook
+    await bot.delete_webhook()
+    await dp.start_polling(bot)
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """Получение обновлений через webhook на встроенном aiohttp сервере"""
+    dp.startup.register(on_webhook_startup)
+    
+    app = web.Application()
+    # Запросы без правильного X-Telegram-Bot-Api-Secret-Token отклоняются
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=WEBHOOK_SECRET
+    ).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    
+    ssl_context = None
+    if WEBHOOK_SSL_CERT and WEBHOOK_SSL_KEY:
+        ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ssl_context.load_cert_chain(WEBHOOK_SSL_CERT, WEBHOOK_SSL_KEY)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT, ssl_context=ssl_context)
+    await site.start()
+    logger.info(f"🌐 Webhook сервер слушает {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
 async def main():
     """Главная функция запуска бота"""
     # Проверка токена перед инициализацией
@@ -20,24 +142,23 @@ async def main():
         logger.error("❌ TELEGRAM_BOT_TOKEN не установлен в .env файле!")
         sys.exit(1)
     
-    # Инициализация бота
-    bot = Bot(
-        token=TELEGRAM_BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
-    
-    # Инициализация диспетчера
-    dp = Dispatcher()
-    dp.include_router(router)
+    # Инициализация бота и диспетчера
+    bot = create_bot()
+    dp = create_dispatcher()
     
-    logger.info("🤖 Бот запускается...")
+    logger.info(f"🤖 Бот запускается ({TELEGRAM_UPDATES_MODE})...")
+    metrics_runner = await start_metrics_server()
     
     try:
-        # Запуск polling
-        await dp.start_polling(bot)
+        if TELEGRAM_UPDATES_MODE == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            await run_polling(bot, dp)
     except Exception as e:
         logger.error(f"❌ Ошибка при запуске бота: {e}")
     finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
         await bot.session.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,87 @@
+# telegram_bot/bot_config.py
+import os
+from dotenv import load_dotenv
+
+# Загрузка переменных окружения
+load_dotenv()
+
+# Настройки Telegram бота
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+
+# Режим работы с устройством:
+#   http     - через FingerBot API (FINGERBOT_API_URL)
+#   embedded - слой управления устройством из fingerbot_api вызывается прямо в процессе бота
+BOT_BACKEND = os.getenv("BOT_BACKEND", "http")
+FINGERBOT_API_DIR = os.getenv(
+    "FINGERBOT_API_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fingerbot_api")
+)
+
+# Получение обновлений от Telegram: polling (long polling) или webhook
+TELEGRAM_UPDATES_MODE = os.getenv("TELEGRAM_UPDATES_MODE", "polling")
+
+# Свой адрес Bot API (например, локальный fake_telegram.py для замеров), пусто - api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
+# Настройки webhook:
+#   WEBHOOK_URL - публичный адрес, на который Telegram шлет обновления (без пути)
+#   WEBHOOK_PATH/HOST/PORT - где слушает встроенный aiohttp сервер
+#   WEBHOOK_SECRET - секрет, который Telegram передает в X-Telegram-Bot-Api-Secret-Token
+#   WEBHOOK_SSL_CERT/KEY - самоподписанный сертификат; без них TLS завершает локальный прокси
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_SSL_CERT = os.getenv("WEBHOOK_SSL_CERT", "")
+WEBHOOK_SSL_KEY = os.getenv("WEBHOOK_SSL_KEY", "")
+
+# Настройки API
+FINGERBOT_API_URL = os.getenv("FINGERBOT_API_URL", "http://localhost:5001")
+
+# Общая keep-alive сессия к API: размер пула, время жизни соединения и таймаут запроса (секунды)
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "20"))
+API_KEEPALIVE_TIMEOUT = float(os.getenv("API_KEEPALIVE_TIMEOUT", "60"))
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "10"))
+
+# Ждать подтверждения клика от устройства (reported-свойства shadow), а не только ответа облака
+BOT_CLICK_CONFIRM = os.getenv("BOT_CLICK_CONFIRM", "0") == "1"
+
+# Антифлуд: лимит вида "N/S" - не больше N сообщений за S секунд (пополнение равномерное)
+#   THROTTLE_CLICK/BATTERY/FALLBACK/DEFAULT - на одного пользователя для каждого вида обработчиков
+#   THROTTLE_GLOBAL - на всех пользователей вместе
+#   THROTTLE_NOTIFY_COOLDOWN - как часто напоминать пользователю о лимите (секунды)
+def parse_limit(value):
+    """Разбор лимита "N/S" в (N, S)"""
+    count, period = value.split("/")
+    return int(count), float(period)
+
+THROTTLE_LIMITS = {
+    "click": parse_limit(os.getenv("THROTTLE_CLICK", "3/10")),
+    "battery": parse_limit(os.getenv("THROTTLE_BATTERY", "2/30")),
+    "fallback": parse_limit(os.getenv("THROTTLE_FALLBACK", "5/30")),
+    "default": parse_limit(os.getenv("THROTTLE_DEFAULT", "5/10"))
+}
+THROTTLE_GLOBAL = parse_limit(os.getenv("THROTTLE_GLOBAL", "30/1"))
+THROTTLE_NOTIFY_COOLDOWN = float(os.getenv("THROTTLE_NOTIFY_COOLDOWN", "10"))
+
+# Логирование: уровень и формат text или json
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# Метрики бота в формате Prometheus: http://BOT_METRICS_HOST:BOT_METRICS_PORT/metrics (0 - отключить)
+BOT_METRICS_HOST = os.getenv("BOT_METRICS_HOST", "127.0.0.1")
+BOT_METRICS_PORT = int(os.getenv("BOT_METRICS_PORT", "0"))
+
+# Проверка обязательных переменных
+if BOT_BACKEND not in ("http", "embedded"):
+    raise ValueError(f"Неизвестный BOT_BACKEND: {BOT_BACKEND} (ожидается http или embedded)")
+
+if TELEGRAM_UPDATES_MODE not in ("polling", "webhook"):
+    raise ValueError(f"Неизвестный TELEGRAM_UPDATES_MODE: {TELEGRAM_UPDATES_MODE} (ожидается polling или webhook)")
+
+if TELEGRAM_UPDATES_MODE == "webhook" and not (WEBHOOK_URL and WEBHOOK_SECRET):
+    raise ValueError("Для режима webhook нужны WEBHOOK_URL и WEBHOOK_SECRET в .env файле")
+
+if not TELEGRAM_BOT_TOKEN:
+    raise ValueError("TELEGRAM_BOT_TOKEN не установлен в .env файле")
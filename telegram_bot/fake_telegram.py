@@ -0,0 +1,170 @@
+# telegram_bot/fake_telegram.py
+"""Локальный fake Telegram Bot API для замера задержки обработки обновлений.
+
+1) python fake_telegram.py --mode polling --updates 200
+2) в другом терминале запустить бота с
+   TELEGRAM_API_URL=http://127.0.0.1:8081 TELEGRAM_UPDATES_MODE=polling
+   (для webhook: TELEGRAM_UPDATES_MODE=webhook WEBHOOK_URL=http://127.0.0.1:8443 WEBHOOK_SECRET=...)
+
+Сервер отправляет боту /start от разных чатов и измеряет время
+от появления обновления до первого sendMessage в этот чат.
+"""
+import argparse
+import asyncio
+import json
+import time
+from aiohttp import web, ClientSession
+
+
+class FakeTelegram:
+    def __init__(self, mode):
+        self.mode = mode
+        self.updates = []
+        self.next_update_id = 1
+        self.new_update = asyncio.Event()
+        self.ready = asyncio.Event()
+        self.webhook_url = None
+        self.webhook_secret = None
+        self.waiters = {}
+        self.message_id = 0
+
+    async def read_params(self, request):
+        if request.content_type == "application/json":
+            return await request.json()
+        return dict(await request.post())
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        params = await self.read_params(request)
+        handler = getattr(self, f"api_{method}", None)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    async def api_getMe(self, params):
+        return {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+
+    async def api_getUpdates(self, params):
+        self.ready.set()
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates and timeout:
+            self.new_update.clear()
+            try:
+                await asyncio.wait_for(self.new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates
+
+    async def api_setWebhook(self, params):
+        self.webhook_url = params["url"]
+        self.webhook_secret = params.get("secret_token")
+        self.ready.set()
+        return True
+
+    async def api_sendMessage(self, params):
+        chat_id = int(params["chat_id"])
+        waiter = self.waiters.pop(chat_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(time.perf_counter())
+        self.message_id += 1
+        return {
+            "message_id": self.message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params.get("text", "")
+        }
+
+    async def api_editMessageText(self, params):
+        return await self.api_sendMessage(params)
+
+    def make_update(self, chat_id, text):
+        update = {
+            "update_id": self.next_update_id,
+            "message": {
+                "message_id": self.next_update_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "Guest"},
+                "text": text,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}]
+            }
+        }
+        self.next_update_id += 1
+        return update
+
+    async def deliver(self, session, update):
+        if self.mode == "webhook":
+            headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook_secret or ""}
+            async with session.post(self.webhook_url, json=update, headers=headers) as response:
+                await response.read()
+        else:
+            self.updates.append(update)
+            self.new_update.set()
+
+    async def measure_one(self, session, chat_id):
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters[chat_id] = waiter
+        started = time.perf_counter()
+        await self.deliver(session, self.make_update(chat_id, "/start"))
+        return await asyncio.wait_for(waiter, 30) - started
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API для замера задержки обновлений")
+    parser.add_argument("--mode", choices=["polling", "webhook"], default="polling")
+    parser.add_argument("--updates", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+
+    fake = FakeTelegram(args.mode)
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", fake.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    print(f"🧪 Fake Telegram API: http://{args.host}:{args.port} (режим {args.mode}), ждем бота...")
+
+    await fake.ready.wait()
+    # Даем боту закончить запуск (регистрацию webhook, первый getUpdates)
+    await asyncio.sleep(0.5)
+
+    latencies = []
+    chat_ids = iter(range(1000, 1000 + args.updates))
+
+    async def worker(session):
+        for chat_id in chat_ids:
+            latencies.append(await fake.measure_one(session, chat_id))
+
+    started = time.perf_counter()
+    async with ClientSession() as session:
+        await asyncio.gather(*[worker(session) for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - started
+
+    ms = [latency * 1000 for latency in latencies]
+    print(json.dumps({
+        "mode": args.mode,
+        "updates": len(ms),
+        "concurrency": args.concurrency,
+        "updates_per_second": round(len(ms) / elapsed, 1),
+        "latency_ms": {
+            "mean": round(sum(ms) / len(ms), 2),
+            "p50": round(percentile(ms, 50), 2),
+            "p95": round(percentile(ms, 95), 2),
+            "p99": round(percentile(ms, 99), 2),
+            "max": round(max(ms), 2)
+        }
+    }, indent=2))
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
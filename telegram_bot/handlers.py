@@ -6,11 +6,11 @@ from aiogram.types import Message
 from aiogram.filters import Command, CommandStart
 
 from keyboards import get_quick_click_keyboard
-from config import FINGERBOT_API_URL
+from backend import ApiError
 
 router = Router()
 
-@router.message(CommandStart())
+@router.message(CommandStart(), flags={"throttling_key": "default"})
 async def cmd_start(message: Message):
     """Обработчик команды /start"""
     await message.answer(
@@ -22,77 +22,71 @@ async def cmd_start(message: Message):
         reply_markup=get_quick_click_keyboard()
     )
 
-@router.message(Command("quick_click"))
-async def cmd_quick_click(message: Message, bot: Bot):
+@router.message(Command("quick_click"), flags={"throttling_key": "click"})
+async def cmd_quick_click(message: Message, bot: Bot, backend):
     """Обработчик команды /quick_click"""
-    await send_quick_click_command(message, bot)
+    await send_quick_click_command(message, bot, backend)
 
-@router.message(Command("battery"))
-async def cmd_battery(message: Message, bot: Bot):
+@router.message(Command("battery"), flags={"throttling_key": "battery"})
+async def cmd_battery(message: Message, bot: Bot, backend):
     """Обработчик команды /battery"""
-    await send_battery_check_command(message, bot)
+    await send_battery_check_command(message, bot, backend)
 
-@router.message(F.text == "⚡ Быстрый клик")
-async def quick_click_button(message: Message, bot: Bot):
+@router.message(F.text == "⚡ Быстрый клик", flags={"throttling_key": "click"})
+async def quick_click_button(message: Message, bot: Bot, backend):
     """Обработчик кнопки быстрого клика"""
-    await send_quick_click_command(message, bot)
+    await send_quick_click_command(message, bot, backend)
 
-@router.message(F.text == "🔋 Проверить заряд")
-async def battery_check_button(message: Message, bot: Bot):
+@router.message(F.text == "🔋 Проверить заряд", flags={"throttling_key": "battery"})
+async def battery_check_button(message: Message, bot: Bot, backend):
     """Обработчик кнопки проверки заряда"""
-    await send_battery_check_command(message, bot)
+    await send_battery_check_command(message, bot, backend)
 
-async def send_quick_click_command(message: Message, bot: Bot):
-    """Отправка команды быстрого клика"""
-    # Показываем "печатает..."
+async def update_ack(ack: Message, message: Message, text: str):
+    """Заменить подтверждение итоговым результатом (или отправить его отдельно)"""
     try:
-        await bot.send_chat_action(
-            chat_id=message.chat.id, 
-            action="typing"
-        )
+        await ack.edit_text(text)
     except Exception:
-        pass  # Игнорируем ошибки отправки action
+        await message.answer(text, reply_markup=get_quick_click_keyboard())
+
+async def send_quick_click_command(message: Message, bot: Bot, backend):
+    """Отправка команды быстрого клика"""
+    # Сразу подтверждаем нажатие, результат от устройства допишем в это же сообщение
+    ack = await message.answer("⏳ <b>Отправляю команду 'Быстрый клик'...</b>")
     
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{FINGERBOT_API_URL}/check_battery", timeout=10) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    if result.get("success"):
-                        await message.answer(
-                            "✅ <b>Команда 'Быстрый клик' отправлена!</b>\n"
-                            "FingerBot выполнил нажатие.",
-                            reply_markup=get_quick_click_keyboard()
-                        )
-                    else:
-                        await message.answer(
-                            "❌ <b>Ошибка выполнения команды.</b>",
-                            reply_markup=get_quick_click_keyboard()
-                        )
-                else:
-                    await message.answer(
-                        f"❌ <b>Ошибка API:</b> {response.status}",
-                        reply_markup=get_quick_click_keyboard()
-                    )
-                    
+        result = await backend.quick_click()
+        if result.get("success"):
+            if result.get("deduplicated"):
+                text = "✅ <b>Команда 'Быстрый клик' уже отправлена!</b>\n"
+            else:
+                text = "✅ <b>Команда 'Быстрый клик' отправлена!</b>\n"
+            
+            # confirmed: None - подтверждение не запрашивалось
+            if result.get("confirmed") is False:
+                text += "⚠️ FingerBot пока не подтвердил нажатие."
+            elif result.get("deduplicated"):
+                text += "Повторное нажатие не требуется."
+            else:
+                text += "FingerBot выполнил нажатие."
+        else:
+            text = "❌ <b>Ошибка выполнения команды.</b>"
+                
+    except ApiError as e:
+        text = f"❌ <b>Ошибка API:</b> {e.status}"
     except aiohttp.ClientConnectionError:
-        await message.answer(
+        text = (
             "❌ <b>Не удалось подключиться к FingerBot API.</b>\n"
-            "Проверьте, запущен ли API сервер.",
-            reply_markup=get_quick_click_keyboard()
+            "Проверьте, запущен ли API сервер."
         )
     except asyncio.TimeoutError:
-        await message.answer(
-            "❌ <b>Таймаут подключения.</b>",
-            reply_markup=get_quick_click_keyboard()
-        )
+        text = "❌ <b>Таймаут подключения.</b>"
     except Exception as e:
-        await message.answer(
-            f"❌ <b>Ошибка:</b> {str(e)}",
-            reply_markup=get_quick_click_keyboard()
-        )
+        text = f"❌ <b>Ошибка:</b> {str(e)}"
+    
+    await update_ack(ack, message, text)
 
-async def send_battery_check_command(message: Message, bot: Bot):
+async def send_battery_check_command(message: Message, bot: Bot, backend):
     """Отправка команды проверки заряда"""
     # Показываем "печатает..."
     try:
@@ -104,28 +98,25 @@ async def send_battery_check_command(message: Message, bot: Bot):
         pass
     
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{FINGERBOT_API_URL}/check_battery", timeout=10) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    if result.get("success"):
-                        # Отправляем сообщение с Markdown разметкой
-                        await message.answer(
-                            result["message"],
-                            parse_mode="Markdown",
-                            reply_markup=get_quick_click_keyboard()
-                        )
-                    else:
-                        await message.answer(
-                            "❌ <b>Не удалось получить информацию о батарее.</b>",
-                            reply_markup=get_quick_click_keyboard()
-                        )
-                else:
-                    await message.answer(
-                        f"❌ <b>Ошибка API:</b> {response.status}",
-                        reply_markup=get_quick_click_keyboard()
-                    )
-                    
+        result = await backend.check_battery()
+        if result.get("success"):
+            # Отправляем сообщение с Markdown разметкой
+            await message.answer(
+                result["message"],
+                parse_mode="Markdown",
+                reply_markup=get_quick_click_keyboard()
+            )
+        else:
+            await message.answer(
+                "❌ <b>Не удалось получить информацию о батарее.</b>",
+                reply_markup=get_quick_click_keyboard()
+            )
+                
+    except ApiError as e:
+        await message.answer(
+            f"❌ <b>Ошибка API:</b> {e.status}",
+            reply_markup=get_quick_click_keyboard()
+        )
     except aiohttp.ClientConnectionError:
         await message.answer(
             "❌ <b>Не удалось подключиться к FingerBot API.</b>\n"
@@ -143,7 +134,7 @@ async def send_battery_check_command(message: Message, bot: Bot):
             reply_markup=get_quick_click_keyboard()
         )
 
-@router.message()
+@router.message(flags={"throttling_key": "fallback"})
 async def any_message(message: Message):
     """Обработчик любых других сообщений"""
     await message.answer(
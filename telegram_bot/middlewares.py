@@ -0,0 +1,135 @@
+# telegram_bot/middlewares.py
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import Message
+
+from bot_config import FINGERBOT_API_DIR
+
+# Модуль метрик общий с fingerbot_api
+if FINGERBOT_API_DIR not in sys.path:
+    sys.path.append(FINGERBOT_API_DIR)
+import metrics
+
+THROTTLED_TEXT = "⏳ <b>Слишком много запросов.</b>\nПодождите немного и попробуйте снова."
+
+
+class BucketStore:
+    """Token buckets в памяти с удалением давно не использованных ключей"""
+
+    def __init__(self, ttl=600, prune_every=1000):
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self._buckets = {}
+        self._calls = 0
+
+    def take(self, key, rate, burst, now=None):
+        """Взять токен из bucket ключа. False - лимит исчерпан"""
+        now = time.monotonic() if now is None else now
+        self._calls += 1
+        if self._calls % self.prune_every == 0:
+            self.prune(now)
+
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return False
+        self._buckets[key] = (tokens - 1, now)
+        return True
+
+    def prune(self, now=None):
+        """Удалить ключи, не использовавшиеся дольше ttl (их bucket уже полон)"""
+        now = time.monotonic() if now is None else now
+        expired = [key for key, (_, updated) in self._buckets.items() if now - updated > self.ttl]
+        for key in expired:
+            del self._buckets[key]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+bot_throttled_total = metrics.registry.counter(
+    "bot_throttled_total", "Сообщения, отклоненные антифлудом", labels=("key",)
+)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничение частоты сообщений: на пользователя (по виду обработчика) и общее на бота.
+
+    Вид обработчика задается флагом throttling_key ("click", "battery", "fallback"...),
+    лимиты - словарем {вид: (burst, period_seconds)}.
+    Лишние сообщения не доходят до обработчика и не вызывают API.
+    """
+
+    def __init__(self, limits, global_limit, notify_cooldown=10.0):
+        self.limits = limits
+        self.global_limit = global_limit
+        self.notify_cooldown = notify_cooldown
+        self.store = BucketStore()
+        self._notified = {}
+        self.throttled = 0
+
+    def _take(self, key, limit):
+        burst, period = limit
+        return self.store.take(key, burst / period, burst)
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: Dict[str, Any]
+    ) -> Any:
+        throttling_key = get_flag(data, "throttling_key", default="default")
+        limit = self.limits.get(throttling_key, self.limits["default"])
+        user_id = event.from_user.id if event.from_user else event.chat.id
+
+        if self._take((user_id, throttling_key), limit) and self._take("global", self.global_limit):
+            return await handler(event, data)
+
+        self.throttled += 1
+        bot_throttled_total.inc(key=throttling_key)
+        # Предупреждаем не чаще раза в notify_cooldown, чтобы не отвечать на каждое сообщение флуда
+        now = time.monotonic()
+        if now - self._notified.get(user_id, 0) >= self.notify_cooldown:
+            self._notified[user_id] = now
+            if len(self._notified) > 10000:
+                self._notified = {
+                    uid: t for uid, t in self._notified.items() if now - t < self.notify_cooldown
+                }
+            await event.answer(THROTTLED_TEXT)
+        return None
+
+
+bot_handler_seconds = metrics.registry.histogram(
+    "bot_handler_seconds", "Время обработки сообщения ботом", labels=("handler",)
+)
+bot_messages_total = metrics.registry.counter(
+    "bot_messages_total", "Сообщения боту по обработчикам и результату", labels=("handler", "result")
+)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Время и число вызовов обработчиков сообщений (в том же формате, что и метрики API)"""
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object else "unknown"
+        started = time.perf_counter()
+        result = "error"
+        try:
+            response = await handler(event, data)
+            result = "ok"
+            return response
+        finally:
+            bot_handler_seconds.observe(time.perf_counter() - started, handler=name)
+            bot_messages_total.inc(handler=name, result=result)